@@ -471,23 +471,33 @@ export default function AppliedJobs() {
     });
   };
 
-  // Fetch all applied jobs (history)
+  // Fetch all applied jobs (history), newest first, one page at a time
   async function fetchHistoryFromServer() {
-    const res = await fetch(`${HISTORY_API}/`, {
-      method: "GET",
-      headers: {
-        Accept: "application/json",
-        ...authHeaders(),
-      },
-    });
-    if (!res.ok) {
-      if (res.status === 401 || res.status === 403) {
-        throw new Error("Not authenticated");
+    const pageSize = 200;
+    const docs = [];
+    let cursor = null;
+    for (;;) {
+      const params = new URLSearchParams({ limit: String(pageSize) });
+      if (cursor) params.set("cursor", cursor);
+      const res = await fetch(`${HISTORY_API}?${params}`, {
+        method: "GET",
+        headers: {
+          Accept: "application/json",
+          ...authHeaders(),
+        },
+      });
+      if (!res.ok) {
+        if (res.status === 401 || res.status === 403) {
+          throw new Error("Not authenticated");
+        }
+        throw new Error(`History API ${res.status}`);
       }
-      throw new Error(`History API ${res.status}`);
+      const data = await res.json();
+      const page = Array.isArray(data) ? data : [];
+      docs.push(...page);
+      cursor = res.headers.get("X-Next-Cursor");
+      if (page.length === 0 || !cursor) break;
     }
-    const data = await res.json();
-    const docs = Array.isArray(data) ? data : [];
     return docs.map((d, i) => normalizeJob(d, i));
   }
 
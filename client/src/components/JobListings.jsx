@@ -583,10 +583,20 @@ export default function JobListings() {
 
   // Server calls
   async function fetchAllFromServer() {
-    const res = await fetch(`${JOBS_API}/`, { headers: { Accept: "application/json" } });
-    if (!res.ok) throw new Error(`Jobs API ${res.status}`);
-    const data = await res.json();
-    const docs = Array.isArray(data) ? data : [];
+    const pageSize = 200;
+    const docs = [];
+    let cursor = null;
+    for (;;) {
+      const params = new URLSearchParams({ limit: String(pageSize) });
+      if (cursor) params.set("cursor", cursor);
+      const res = await fetch(`${JOBS_API}/?${params}`, { headers: { Accept: "application/json" } });
+      if (!res.ok) throw new Error(`Jobs API ${res.status}`);
+      const data = await res.json();
+      const page = Array.isArray(data) ? data : [];
+      docs.push(...page);
+      cursor = res.headers.get("X-Next-Cursor");
+      if (page.length === 0 || !cursor) break;
+    }
     return docs.map((d, i) => normalizeJob(d, i));
   }
 
@@ -608,19 +618,13 @@ export default function JobListings() {
   // Load applied ids from server (never fail job load if this errors)
   async function fetchAppliedFromServerSafe() {
     try {
-      const res = await fetch(`${HISTORY_API}/`, {
+      const res = await fetch(`${HISTORY_API}/ids`, {
         method: "GET",
         headers: { Accept: "application/json", ...authHeaders() },
       });
       if (!res.ok) return new Set();
       const items = await res.json();
-      const ids = new Set(
-        (Array.isArray(items) ? items : []).map((j) => {
-          const id = j?._id?.$oid || j?._id || j?.id || j?.job_id;
-          return String(id || "").trim();
-        })
-      );
-      return ids;
+      return new Set((Array.isArray(items) ? items : []).map((id) => String(id || "").trim()));
     } catch {
       return new Set();
     }
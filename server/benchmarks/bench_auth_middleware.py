@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the auth middleware: the old BaseHTTPMiddleware function
+vs the pure ASGI AuthMiddleware.
+
+    python -m server.benchmarks.bench_auth_middleware --requests 2000
+
+Each variant wraps the same tiny FastAPI app, and requests are driven straight
+through the ASGI interface (no sockets), so the differences are the middleware
+alone. "legacy" is the previous global_auth_middleware with its linear prefix
+loop, minus the "/" entry that made every path public, so it verifies the token
+like the new one; the streamed route shows BaseHTTPMiddleware's body relay.
+"""
+import argparse
+import asyncio
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from server.config.auth_filter import AuthMiddleware
+from server.services.auth_service import create_access_token, decode_access_token
+
+
+def build_app(variant: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/user/me")
+    async def me():
+        return PlainTextResponse("ok")
+
+    @app.get("/jobs/stream")
+    async def stream():
+        return StreamingResponse((b"x" * 64 for _ in range(50)), media_type="application/x-ndjson")
+
+    if variant == "legacy":
+        @app.middleware("http")
+        async def global_auth_middleware(request: Request, call_next):
+            if request.method == "OPTIONS":
+                return await call_next(request)
+            path = request.url.path
+            public_prefixes = ("/auth/login", "/auth/signup", "/api/translate", "/jobs/embed")
+            if path == "/" or any(path.startswith(p) for p in public_prefixes):
+                return await call_next(request)
+            auth_header = request.headers.get("authorization")
+            if not auth_header or not auth_header.startswith("Bearer "):
+                return PlainTextResponse("Unauthorized access", status_code=403)
+            if not decode_access_token(auth_header.split(" ", 1)[1]):
+                return PlainTextResponse("Invalid or expired token", status_code=403)
+            return await call_next(request)
+    elif variant == "asgi":
+        app.add_middleware(AuthMiddleware)
+    return app
+
+
+async def drive(app, path: str, token: str, n: int) -> float:
+    headers = [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())]
+
+    async def request():
+        sent = False
+
+        async def receive():
+            nonlocal sent
+            if sent:
+                # Only reached by BaseHTTPMiddleware's disconnect watcher
+                await asyncio.sleep(3600)
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        await app(dict(scope), receive, send)
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": headers, "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    for _ in range(min(n, 200)):  # warm up
+        await request()
+    start = time.perf_counter()
+    for _ in range(n):
+        await request()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = create_access_token({"sub": "bench@example.com"})
+    print(f"requests={args.requests} (µs per request, lower is better)")
+    baseline = {}
+    for variant in ("none", "legacy", "asgi"):
+        app = build_app(variant)
+        for path in ("/user/me", "/jobs/stream"):
+            us = asyncio.run(drive(app, path, token, args.requests))
+            baseline.setdefault(path, us)
+            print(f"{variant:<7} {path:<13} {us:8.1f}µs  overhead={us - baseline[path]:+7.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
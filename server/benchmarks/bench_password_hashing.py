@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Load-test password checks: inline bcrypt on the event loop vs the hashing pool.
+
+    python -m server.benchmarks.bench_password_hashing --logins 64 --workers 1 2 4 8
+    python -m server.benchmarks.bench_password_hashing --rounds 12
+
+Fires `--logins` concurrent logins at one event loop and reports throughput,
+login latency percentiles and the worst event-loop stall seen by a 5 ms ticker,
+i.e. how long any other request on the worker would have been held up. The pool
+should scale with --workers up to the number of cores; no database needed.
+"""
+import argparse
+import asyncio
+import os
+import time
+import bcrypt
+import numpy as np
+from server.services.auth_service import PasswordHasher, verify_password
+
+TICK = 0.005
+
+
+async def ticker(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - t - TICK) * 1000)
+
+
+async def run(check, logins: int):
+    stop, lags, latencies = asyncio.Event(), [], []
+    tick = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(0)
+
+    async def login():
+        t = time.perf_counter()
+        assert await check()
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return logins / elapsed, p50, p95, max(lags or [0.0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost of the test hash")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    stored = bcrypt.hashpw(b"password", bcrypt.gensalt(rounds=args.rounds)).decode()
+    print(f"logins={args.logins} rounds={args.rounds} cores={os.cpu_count()}")
+
+    async def inline():
+        return verify_password("password", stored)
+
+    rate, p50, p95, lag = asyncio.run(run(inline, args.logins))
+    print(f"inline      {rate:7.1f} logins/s p50={p50:7.1f}ms p95={p95:7.1f}ms max loop stall={lag:7.1f}ms")
+
+    for workers in sorted(set(args.workers)):
+        hasher = PasswordHasher(workers, max_queue=args.logins)
+        rate, p50, p95, lag = asyncio.run(run(lambda: hasher.run(verify_password, "password", stored), args.logins))
+        stats = hasher.stats()
+        print(
+            f"pool x{workers:<3} {rate:7.1f} logins/s p50={p50:7.1f}ms p95={p95:7.1f}ms max loop stall={lag:7.1f}ms "
+            f"avg wait={stats['avg_wait_ms']:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare the float32 catalog matrix with the int8-quantized one.
+
+    python -m server.benchmarks.bench_quantized --jobs 100000
+    python -m server.benchmarks.bench_quantized --embeddings jobs.npy
+
+Reports resident matrix size, full-scan latency (what get_prior/update_prior pay),
+top-k latency and recall@k against float32 scoring, with and without the float
+re-rank from the spill file; no database needed.
+"""
+import argparse
+import time
+import numpy as np
+from server.benchmarks.bench_two_stage import exact_top_k, normalized, synthetic_embeddings
+from server.services.catalog_service import AttributeIndex, Catalog, QuantizedMatrix
+
+
+def timed(fn, queries):
+    latencies, results = [], []
+    for q in queries:
+        t = time.perf_counter()
+        results.append(fn(q))
+        latencies.append((time.perf_counter() - t) * 1000)
+    return np.percentile(latencies, [50, 95]), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--embeddings", help=".npy matrix of real job embeddings (overrides --jobs)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    matrix = np.load(args.embeddings) if args.embeddings else synthetic_embeddings(args.jobs)
+    matrix = normalized(matrix.astype(np.float32))
+    rng = np.random.default_rng(1)
+    queries = matrix[rng.integers(len(matrix), size=args.queries)]
+    queries = normalized((queries + rng.standard_normal(queries.shape) * 0.75 / np.sqrt(matrix.shape[1])).astype(np.float32))
+    ids = [str(i) for i in range(len(matrix))]
+    print(f"jobs={len(matrix)} dim={matrix.shape[1]} queries={len(queries)} k={args.k}")
+
+    (p50, p95), exact_scores = timed(lambda q: matrix @ q, queries)
+    truth = [set(exact_top_k(matrix, q, args.k).tolist()) for q in queries]
+    print(f"float32      size={matrix.nbytes / 2**20:6.1f}MiB scan p50={p50:6.2f}ms p95={p95:6.2f}ms")
+
+    for label, spill in (("int8", False), ("int8+rerank", True)):
+        start = time.perf_counter()
+        quantized = QuantizedMatrix.from_float(matrix, spill=spill)
+        build = time.perf_counter() - start
+        catalog = Catalog(ids, quantized, AttributeIndex(), version=0)
+        (p50, p95), scores = timed(lambda q: quantized @ q, queries)
+        error = max(float(np.abs(a - b).max()) for a, b in zip(scores, exact_scores))
+        (t50, t95), tops = timed(lambda q: catalog.top_k(q, args.k)[0], queries)
+        recall = np.mean([len(expected & set(rows.tolist())) / args.k for expected, rows in zip(truth, tops)])
+        print(
+            f"{label:<12} size={quantized.nbytes / 2**20:6.1f}MiB scan p50={p50:6.2f}ms p95={p95:6.2f}ms "
+            f"max|err|={error:.4f} top-k p50={t50:6.2f}ms p95={t95:6.2f}ms recall={recall:.3f} build={build:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
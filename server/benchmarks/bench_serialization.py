@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compare the pydantic response path with the trusted orjson fast path for job lists.
+
+    python -m server.benchmarks.bench_serialization --sizes 1000 10000 100000
+
+"pydantic" mimics what FastAPI does for response_model=List[Job] under pydantic v1:
+build Job(**doc) per document, re-validate the list against the response model,
+jsonable_encoder it and json.dumps the result. "fast" is job_document() + orjson.dumps.
+"""
+import argparse
+import json
+import random
+import time
+from typing import List
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+from server.models.job import Job, job_document
+
+
+def synthetic_docs(n: int, seed: int = 0) -> List[dict]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": f"job-{i}",
+            "title": f"Software Engineer Intern {i}",
+            "company": f"Company {i % 500}",
+            "location": rnd.choice(["Bengaluru, Karnataka", "Remote", "Pune, Maharashtra"]),
+            "employmentType": rnd.choice(["Full-Time", "Internship"]),
+            "description": "Build and ship backend services. " * 20,
+            "salaryMin": 10000.0,
+            "salaryMax": 20000.0,
+            "currency": "INR",
+            "raw": {"job_id": str(i), "job_title": "Software Engineer Intern", "company_name": "Company"},
+            "embedding": [rnd.random() for _ in range(384)],
+        }
+        for i in range(n)
+    ]
+
+
+def pydantic_path(docs: List[dict]) -> bytes:
+    jobs = [Job(**doc) for doc in docs]
+    validated = parse_obj_as(List[Job], [job.dict() for job in jobs])
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_path(docs: List[dict]) -> bytes:
+    return orjson.dumps([job_document(doc) for doc in docs])
+
+
+def timed(fn, docs, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(docs)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'jobs':>8} {'pydantic ms':>12} {'fast ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        docs = synthetic_docs(n)
+        assert orjson.loads(fast_path(docs[:10])) == json.loads(pydantic_path(docs[:10]))
+        slow = timed(pydantic_path, docs, args.repeat)
+        fast = timed(fast_path, docs, args.repeat)
+        print(f"{n:>8} {slow:>12.1f} {fast:>10.1f} {slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
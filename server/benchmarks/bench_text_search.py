@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark the in-process BM25 index on a synthetic catalog.
+
+    python -m server.benchmarks.bench_text_search --jobs 100000
+
+Reports build time, index size and query latency percentiles; no database needed.
+"""
+import argparse
+import itertools
+import random
+import time
+import numpy as np
+from server.services.search_service import BM25Index
+
+
+def synthetic_jobs(n: int, vocab_size: int, desc_words: int, seed: int = 0):
+    rnd = random.Random(seed)
+    # Zipf-ish vocabulary so a few terms are very common, like real postings
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    cum_weights = list(itertools.accumulate(1.0 / (i + 1) for i in range(vocab_size)))
+    for i in range(n):
+        words = rnd.choices(vocab, cum_weights=cum_weights, k=desc_words + 6)
+        yield {
+            "id": f"job-{i}",
+            "title": " ".join(words[:4]),
+            "company": " ".join(words[4:6]),
+            "description": " ".join(words[6:]),
+        }, words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--vocab", type=int, default=20_000)
+    parser.add_argument("--desc-words", type=int, default=80)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    index = BM25Index()
+    samples = []
+    start = time.perf_counter()
+    for job, words in synthetic_jobs(args.jobs, args.vocab, args.desc_words):
+        index.add(job)
+        if len(samples) < args.queries:
+            samples.append(" ".join(random.sample(words, 3)))
+    build = time.perf_counter() - start
+
+    latencies = []
+    for q in samples:
+        t = time.perf_counter()
+        index.search(q, limit=20)
+        latencies.append((time.perf_counter() - t) * 1000)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+
+    print(f"jobs={len(index)} terms={len(index.postings)}")
+    print(f"build: {build:.1f}s ({len(index) / build:.0f} jobs/s)")
+    print(f"index size: {index.nbytes() / 2**20:.1f} MiB")
+    print(f"query latency ms: p50={p50:.2f} p95={p95:.2f} p99={p99:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Compare exact top-k cosine scoring over the catalog with the two-stage PCA scorer.
+
+    python -m server.benchmarks.bench_two_stage --jobs 100000 --dims 64 128
+    python -m server.benchmarks.bench_two_stage --embeddings jobs.npy
+
+Reports recall@k of the two-stage result against exact scoring and query latency
+percentiles for both. Without --embeddings the catalog is synthetic: clustered
+vectors with a decaying spectrum, like sentence embeddings; no database needed.
+"""
+import argparse
+import time
+import numpy as np
+from server.services.catalog_service import AttributeIndex, Catalog, RERANK_FACTOR, fit_projection
+
+
+def synthetic_embeddings(n: int, dim: int = 384, clusters: int = 500, decay: float = 0.5, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rotation, _ = np.linalg.qr(rng.standard_normal((dim, dim)))
+    scale = (np.arange(1, dim + 1) ** -decay).astype(np.float32)
+    centers = rng.standard_normal((clusters, dim)) * scale
+    points = centers[rng.integers(clusters, size=n)] + 0.5 * rng.standard_normal((n, dim)) * scale
+    return (points @ rotation).astype(np.float32)
+
+
+def normalized(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def exact_top_k(matrix: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    scores = matrix @ q
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def percentiles(latencies):
+    return np.percentile(latencies, [50, 95])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--embeddings", help=".npy matrix of real job embeddings (overrides --jobs)")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128])
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--decay", type=float, default=0.5, help="Synthetic spectrum decay (higher = easier)")
+    args = parser.parse_args()
+
+    matrix = np.load(args.embeddings) if args.embeddings else synthetic_embeddings(args.jobs, decay=args.decay)
+    matrix = normalized(matrix.astype(np.float32))
+    rng = np.random.default_rng(1)
+    # Queries land near existing jobs (cosine ~0.8), as user and search embeddings do
+    queries = matrix[rng.integers(len(matrix), size=args.queries)]
+    noise = rng.standard_normal(queries.shape) * 0.75 / np.sqrt(matrix.shape[1])
+    queries = normalized((queries + noise).astype(np.float32))
+    print(f"jobs={len(matrix)} dim={matrix.shape[1]} queries={len(queries)} rerank_factor={RERANK_FACTOR}")
+
+    ids = [str(i) for i in range(len(matrix))]
+    exact = Catalog(ids, matrix, AttributeIndex(), version=0)
+    for k in args.k:
+        truth, latencies = [], []
+        for q in queries:
+            t = time.perf_counter()
+            truth.append(set(exact_top_k(matrix, q, k).tolist()))
+            latencies.append((time.perf_counter() - t) * 1000)
+        p50, p95 = percentiles(latencies)
+        print(f"k={k:<4} exact          p50={p50:6.2f}ms p95={p95:6.2f}ms recall=1.000")
+
+        for dim in args.dims:
+            start = time.perf_counter()
+            projection = fit_projection(matrix, dim, version=0)
+            fit = time.perf_counter() - start
+            centered = matrix - projection.mean
+            explained = np.square(projection.transform(matrix)).sum() / np.square(centered).sum()
+            two_stage = Catalog(ids, matrix, AttributeIndex(), version=0, projection=projection)
+            recalls, latencies = [], []
+            for q, expected in zip(queries, truth):
+                t = time.perf_counter()
+                rows, _ = two_stage.top_k(q, k)
+                latencies.append((time.perf_counter() - t) * 1000)
+                recalls.append(len(expected & set(rows.tolist())) / k)
+            p50, p95 = percentiles(latencies)
+            print(
+                f"k={k:<4} pca{dim:<4} var={explained:.2f} fit={fit:4.1f}s p50={p50:6.2f}ms p95={p95:6.2f}ms "
+                f"recall={np.mean(recalls):.3f} (min {np.min(recalls):.2f}) "
+                f"reduced={two_stage.reduced.nbytes / 2**20:.0f}MiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
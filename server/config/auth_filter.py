@@ -1,19 +1,88 @@
-from fastapi import Request, Response
-from server.services.auth_service import decode_access_token
-
-async def auth_filter(request: Request):
-    # Allow all /auth/* routes, /api/translate, and /jobs/embed
-    if (
-        request.url.path.startswith('/auth') or
-        request.url.path.startswith('/api/translate') or
-        request.url.path == '/jobs/embed'
-    ):
-        return None
-    auth_header = request.headers.get("authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return Response(content="Unauthorized access", status_code=403)
-    token = auth_header.split(" ", 1)[1]
-    payload = decode_access_token(token)
-    if not payload:
-        return Response(content="Invalid or expired token", status_code=403)
+import re
+from typing import Iterable, Optional
+from fastapi import Request
+from starlette.responses import PlainTextResponse
+from server.services.auth_service import bearer_claims
+
+# Routes reachable without a token. Exact paths match only themselves; prefixes
+# match the path and anything below it ("/auth" matches "/auth/login", not "/authx").
+PUBLIC_EXACT = ("/", "/jobs/embed", "/docs", "/redoc", "/openapi.json")
+PUBLIC_PREFIXES = ("/auth", "/api/translate")
+# Catalog browsing is read-only and public; writes and search check the caller in the route
+PUBLIC_READ_PREFIXES = ("/jobs",)
+READ_METHODS = frozenset({"GET", "HEAD"})
+
+
+class PublicRoutes:
+    """Precompiled matcher for the routes that skip authentication."""
+
+    def __init__(self, exact: Iterable[str], prefixes: Iterable[str], read_prefixes: Iterable[str] = ()):
+        self.exact = frozenset(exact)
+        self._prefixes = self._compile(prefixes)
+        self._read_prefixes = self._compile(read_prefixes)
+
+    @staticmethod
+    def _compile(prefixes: Iterable[str]) -> Optional["re.Pattern"]:
+        prefixes = [p.rstrip("/") for p in prefixes]
+        if not prefixes:
+            return None
+        return re.compile("(?:" + "|".join(map(re.escape, prefixes)) + ")(?:/|$)")
+
+    def matches(self, method: str, path: str) -> bool:
+        if path in self.exact:
+            return True
+        if self._prefixes is not None and self._prefixes.match(path):
+            return True
+        return method in READ_METHODS and self._read_prefixes is not None and self._read_prefixes.match(path) is not None
+
+
+PUBLIC_ROUTES = PublicRoutes(PUBLIC_EXACT, PUBLIC_PREFIXES, PUBLIC_READ_PREFIXES)
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
     return None
+
+
+def request_claims(request: Request) -> Optional[dict]:
+    """
+    Verified JWT claims of the request (None without a valid bearer token),
+    decoded once and kept on request.state for the route dependencies.
+    """
+    if not hasattr(request.state, "token_claims"):
+        request.state.token_claims = bearer_claims(request.headers.get("authorization"))
+    return request.state.token_claims
+
+
+class AuthMiddleware:
+    """
+    Pure ASGI auth: verifies the bearer token once, leaves the claims in the
+    request state and rejects protected routes without valid claims. Requests
+    and responses pass through untouched, so streaming bodies keep streaming.
+    """
+
+    def __init__(self, app, public: PublicRoutes = PUBLIC_ROUTES):
+        self.app = app
+        self.public = public
+
+    async def __call__(self, scope, receive, send):
+        # Let CORS preflight (and websockets/lifespan) through
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        authorization = _header(scope, b"authorization")
+        claims = bearer_claims(authorization)
+        scope.setdefault("state", {})["token_claims"] = claims
+        if claims is None and not self.public.matches(scope["method"], scope["path"]):
+            reject = _reject(authorization)
+            await reject(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def _reject(authorization: Optional[str]) -> PlainTextResponse:
+    if not authorization or not authorization.startswith("Bearer "):
+        return PlainTextResponse("Unauthorized access", status_code=403)
+    return PlainTextResponse("Invalid or expired token", status_code=403)
@@ -1,11 +1,78 @@
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
 from fastapi import FastAPI
+import logging
 import os
+from datetime import datetime
 from dotenv import load_dotenv
 
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("MONGO_DB", "RecSys")
 
+# Indexes every hot query relies on, ensured at startup
+INDEXES = {
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("postedAt", ASCENDING)], name="posted_at"),
+        IndexModel([("aliases", ASCENDING)], name="aliases", sparse=True),
+    ],
+    "jobs_archive": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "job_details": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("profile_state", ASCENDING)], name="profile_state", sparse=True),
+    ],
+    "user_state": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "history": [
+        IndexModel([("email", ASCENDING), ("job_id", ASCENDING)], name="email_job_unique", unique=True),
+        IndexModel([("email", ASCENDING), ("applied_at", DESCENDING), ("job_id", DESCENDING)], name="email_applied_at"),
+        IndexModel([("applied_at", DESCENDING)], name="applied_at"),
+    ],
+}
+
+# Query shapes the services run per request; tests/integration/test_indexes.py
+# explain()s each one and fails on a collection scan. Full-collection reads
+# (catalog/index builds, prior propagation) are deliberate scans and not listed.
+INDEXED_QUERIES = [
+    ("jobs", {"id": "job-id"}, None),                       # get/update/delete job, history checks
+    ("jobs", {"id": {"$in": ["job-id"]}}, None),            # recommendations, history, filter
+    ("jobs", {"id": {"$gt": "job-id"}}, [("id", ASCENDING)]),  # keyset pagination
+    ("jobs", {"postedAt": {"$lt": datetime(2000, 1, 1)}}, None),  # archive sweep
+    ("jobs", {}, [("postedAt", DESCENDING)]),               # cold-start recent jobs
+    ("jobs", {"aliases": "job-id"}, None),                  # merged-away duplicate ids
+    ("jobs", {"detailsOffloaded": {"$ne": True}, "_id": {"$gt": ObjectId()}}, [("_id", ASCENDING)]),  # job_details migration
+    ("jobs_archive", {"id": "job-id"}, None),               # archived job detail
+    ("jobs_archive", {"id": {"$in": ["job-id"]}}, None),    # history of expired jobs
+    ("job_details", {"id": "job-id"}, None),                # job detail view, search index build
+    ("job_details", {"id": {"$in": ["job-id"]}}, None),
+    ("users", {"email": "user@example.com"}, None),         # profile, history checks, auth
+    ("users", {"profile_state": "pending"}, None),          # profile worker backlog
+    ("user_state", {"email": "user@example.com"}, None),    # prior/embedding of one user
+    ("user_state", {"email": {"$in": ["user@example.com"]}}, None),  # digest, state migration
+    ("history", {"email": "user@example.com"}, [("applied_at", DESCENDING), ("job_id", DESCENDING)]),  # history pages
+    ("history", {"email": "user@example.com", "job_id": {"$in": ["job-id"]}}, None),  # recommendation exclusion
+    ("history", {"email": {"$in": ["user@example.com"]}}, None),  # digest exclusion
+    ("history", {"applied_at": {"$gte": datetime(2000, 1, 1)}}, None),  # cold-start popularity window
+    ("meta", {"_id": "catalog"}, None),                     # catalog version
+]
+
 def create_db_client():
     client = AsyncIOMotorClient(MONGO_URL)
     return client[DB_NAME]
+
+async def ensure_indexes(db):
+    """Create the registered indexes; existing ones are left untouched."""
+    for collection, indexes in INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate ids already stored: keep serving, but make it visible
+            logging.error("Failed to ensure indexes on %s: %s", collection, e)
@@ -0,0 +1,66 @@
+"""
+Offline near-duplicate sweep over the job catalog.
+
+    python -m server.dedup                  # report clusters only
+    python -m server.dedup --apply          # flag duplicates (JOB_DEDUP_MODE)
+    python -m server.dedup --apply --mode merge
+
+Clusters come from the embedding LSH buckets, confirmed by a text shingle check;
+the earliest-posted job of each cluster is kept. Prints the report as JSON.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import dotenv
+
+dotenv.load_dotenv()
+
+from server.db import create_db_client
+from server.services.dedup_service import sweep_duplicates
+from server.services.logging_service import log_event
+
+
+async def run(mode, apply: bool, out) -> dict:
+    db = create_db_client()
+    start = time.perf_counter()
+    try:
+        report = await sweep_duplicates(db, mode, apply)
+    finally:
+        db.client.close()
+    elapsed = time.perf_counter() - start
+    json.dump(report, out, indent=2, default=str)
+    out.write("\n")
+    print(
+        f"Scanned {report['jobs']} jobs in {elapsed:.2f}s: {report['duplicates']} duplicates "
+        f"in {len(report['clusters'])} clusters{' (applied)' if report['applied'] else ''}",
+        file=sys.stderr,
+    )
+    log_event("job_dedup_sweep", {
+        "jobs": report["jobs"],
+        "clusters": len(report["clusters"]),
+        "duplicates": report["duplicates"],
+        "applied": report["applied"],
+        "elapsed_s": round(elapsed, 3),
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find (and optionally flag or merge) near-duplicate jobs")
+    parser.add_argument("--apply", action="store_true", help="Write the result instead of only reporting it")
+    parser.add_argument("--mode", choices=["flag", "merge"], help="How to apply (default: JOB_DEDUP_MODE)")
+    parser.add_argument("--output", help="JSON report file (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        asyncio.run(run(args.mode, args.apply, out))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Bulk recommendation export for "new jobs for you" digests.
+
+    python -m server.digest --k 10 --output digest.ndjson
+    python -m server.digest --email a@example.com --email b@example.com
+
+Writes one JSON object per user ({"email", "recommendations"}) and reports
+throughput in users per second on stderr.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import dotenv
+
+dotenv.load_dotenv()
+
+from server.db import create_db_client
+from server.services.logging_service import log_event
+from server.services.recommendation_service import iter_recommendations_for_users
+
+
+async def run(emails, k: int, block_size: int, out) -> int:
+    db = create_db_client()
+    count = 0
+    start = time.perf_counter()
+    try:
+        async for result in iter_recommendations_for_users(db, emails or None, k, block_size):
+            out.write(json.dumps(result) + "\n")
+            count += 1
+    finally:
+        db.client.close()
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"Wrote recommendations for {count} users in {elapsed:.2f}s ({rate:.1f} users/s)", file=sys.stderr)
+    log_event("recommendation_digest", {"user_count": count, "elapsed_s": round(elapsed, 3), "users_per_second": round(rate, 1)})
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export top-k job recommendations for many users as NDJSON")
+    parser.add_argument("--email", action="append", help="Only these users (repeatable); default is all users")
+    parser.add_argument("--k", type=int, default=10, help="Recommendations per user")
+    parser.add_argument("--block-size", type=int, default=256, help="Users scored per matrix block")
+    parser.add_argument("--output", help="NDJSON file to write (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        asyncio.run(run(args.email, args.k, args.block_size, out))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from server.routes import auth, jobs, user, translate
-from server.config.auth_filter import auth_filter
-from server.db import create_db_client
+from server.routes import auth, jobs, metrics, user, translate
+from server.config.auth_filter import AuthMiddleware
+from server.db import create_db_client, ensure_indexes
+from server.services.archive_service import JOB_ACTIVE_DAYS, run_archive_sweeper
+from server.services.history_service import migrate_history_arrays
+from server.services.job_service import migrate_job_details
+from server.services.profile_service import run_profile_worker
+from server.services.user_state_service import migrate_user_state
+import asyncio
 import dotenv
+import logging
 from contextlib import asynccontextmanager
 
 
@@ -12,43 +19,51 @@ dotenv.load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.db = create_db_client()
+    await ensure_indexes(app.state.db)
+    # Move cold job fields to job_details in the background; reads work either way
+    migration = asyncio.create_task(migrate_job_details(app.state.db))
+    migration.add_done_callback(log_migration_result("Job details", "Moved cold fields of %d jobs to job_details"))
+    # Move legacy history arrays off user documents into the history collection
+    history_migration = asyncio.create_task(migrate_history_arrays(app.state.db))
+    history_migration.add_done_callback(log_migration_result("History", "Moved history of %d users to the history collection"))
+    # Move embedding/prior off user documents into user_state
+    state_migration = asyncio.create_task(migrate_user_state(app.state.db))
+    state_migration.add_done_callback(log_migration_result("User state", "Moved ML state of %d users to user_state"))
+    # Build embeddings and priors of new and edited profiles
+    profile_worker = asyncio.create_task(run_profile_worker(app.state.db))
+    # Keep the scored catalog to live postings, where expiry is enabled
+    sweeper = asyncio.create_task(run_archive_sweeper(app.state.db)) if JOB_ACTIVE_DAYS > 0 else None
     yield
+    if sweeper is not None:
+        sweeper.cancel()
+    profile_worker.cancel()
+    state_migration.cancel()
+    history_migration.cancel()
+    migration.cancel()
     app.state.db.client.close()
 
-app = FastAPI(lifespan=lifespan)
-
-# 1) Global auth middleware: bypass OPTIONS and public paths
-@app.middleware("http")
-async def global_auth_middleware(request: Request, call_next):
-    # Let CORS preflight through
-    if request.method == "OPTIONS":
-        return await call_next(request)
-
-    path = request.url.path
+def log_migration_result(name: str, message: str):
+    """Done callback logging a background migration's outcome; `message` takes the count"""
+    def log(task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logging.error("%s migration failed: %s", name, task.exception())
+        elif task.result():
+            logging.info(message, task.result())
+    return log
 
-    # Public endpoints (adjust as needed)
-    public_prefixes = (
-        "/auth/login",
-        "/auth/signup",
-        "/api/translate",  # if translation should be public
-        "/",
-        "/jobs/embed",  # Allow embed jobs endpoint
-    )
-    if path == "/" or any(path.startswith(p) for p in public_prefixes):
-        return await call_next(request)
-
-    # Apply auth for the rest
-    auth_response = await auth_filter(request)
-    if auth_response is not None:
-        return auth_response
+app = FastAPI(lifespan=lifespan)
 
-    return await call_next(request)
+# 1) Global auth: pure ASGI, bypasses OPTIONS and public routes (see config/auth_filter.py)
+app.add_middleware(AuthMiddleware)
 
 # 2) Routers
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 app.include_router(user.router, prefix="/user", tags=["user"])
 app.include_router(translate.router, prefix="/api", tags=["translate"])
+app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 
 # 3) CORS: add LAST so it is the OUTERMOST and handles preflight first
 origins = [
@@ -61,6 +76,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],          # include OPTIONS, GET, POST, etc.
     allow_headers=["*"],          # include Content-Type, Authorization, etc.
+    expose_headers=["X-Next-Cursor", "Link", "X-Total-Count", "ETag", "Last-Modified", "X-Profile-State"],  # readable from JS
 )
 
 @app.get("/")
@@ -1,18 +1,18 @@
+import os
 import numpy as np
+from functools import lru_cache
 from sentence_transformers import SentenceTransformer
 from typing import List, Tuple
 from numpy.linalg import norm
+from server.services.catalog_service import get_catalog
 
 model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
 
 async def get_all_job_embeddings(db) -> Tuple[np.ndarray, List[str]]:
-    embeddings = []
-    job_ids = []
-    async for job in db.jobs.find({}, {"embedding": 1, "id": 1}):
-        if "embedding" in job:
-            embeddings.append(job["embedding"])
-            job_ids.append(job["id"])
-    return np.array(embeddings, dtype=np.float32), job_ids
+    # Served from the resident catalog; rows are already L2-normalized
+    catalog = await get_catalog(db)
+    return catalog.matrix, catalog.ids
 
 def cosine_sim(query_vec, embeddings):
     query_norm = query_vec / norm(query_vec)
@@ -22,9 +22,23 @@ def cosine_sim(query_vec, embeddings):
 def get_embedding(texts: List[str]) -> np.ndarray:
     return model.encode(texts, convert_to_numpy=True)
 
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _cached_query_embedding(text: str) -> np.ndarray:
+    vec = model.encode([text], convert_to_numpy=True)[0]
+    vec.setflags(write=False)  # shared between callers through the cache
+    return vec
+
+def get_query_embedding(query: str) -> np.ndarray:
+    """Embedding of a search query; repeated queries are served from an LRU cache"""
+    return _cached_query_embedding(" ".join(query.lower().split()))
+
 async def get_prior(db, user_embedding: np.ndarray) -> np.ndarray:
-    job_embeddings, job_ids =  await get_all_job_embeddings(db)
-    prior = (cosine_sim(user_embedding, job_embeddings) + 1) / 2
+    catalog = await get_catalog(db)
+    job_ids = catalog.ids
+    if not job_ids:
+        return {}
+    # Cosine similarity against the catalog, whether it is held as float32 or int8
+    prior = (catalog.scores(user_embedding) + 1) / 2
     prior = np.array(prior / sum(prior)).flatten()
     # convert to dict
     return {job_id: float(prob) for job_id, prob in zip(job_ids, prior)}
@@ -65,7 +79,10 @@ def likelihood(xt, job_embeddings, tau=2.0):
     """
     # cosine similarity of all jobs w.r.t. clicked job
     sims = cosine_sim(xt, job_embeddings).flatten()  # shape: (num_jobs,)
+    return likelihood_from_similarity(sims, tau)
 
+def likelihood_from_similarity(sims: np.ndarray, tau=2.0) -> np.ndarray:
+    """likelihood() for precomputed cosine similarities of the clicked job to every job"""
     # convert similarities into probabilities (softmax with temperature)
     likelihoods = np.exp(sims / tau)
     likelihoods /= likelihoods.sum()
@@ -79,10 +96,11 @@ async def update_prior(db, prior: dict, feedback: np.ndarray) -> np.ndarray:
     prior: Current prior distribution over jobs
     alpha: Learning rate
     '''
-    job_embeddings, jobIds = await get_all_job_embeddings(db)
+    catalog = await get_catalog(db)
+    jobIds = catalog.ids
     prior_array = np.array([prior.get(job_id, 0.0) for job_id in jobIds], dtype=np.float32)
     # compute likelihood
-    prod = likelihood(feedback, job_embeddings) * prior_array # element-wise mutliplication
+    prod = likelihood_from_similarity(catalog.scores(feedback)) * prior_array # element-wise mutliplication
     posterior = prod/prod.sum()
     # convert to dict
     return {job_id: float(prob) for job_id, prob in zip(jobIds, posterior)}
\ No newline at end of file
@@ -13,3 +13,53 @@ class Job(BaseModel):
     currency: Optional[str] = None
     raw: Optional[dict] = None
     embedding: List[float] = None
+
+def job_document(doc: dict) -> dict:
+    """
+    Trusted fast path for documents read from our own jobs collection: shape them
+    like Job(**doc).dict() without re-validating every field.
+    """
+    out = {field: doc.get(field) for field in Job.__fields__}
+    out["id"] = str(doc.get("id") or doc.get("_id") or "")
+    return out
+
+class JobSummary(BaseModel):
+    """Listing view of a job: never carries the embedding or the raw CSV row"""
+    id: str
+    title: Optional[str] = None
+    company: Optional[str] = None
+    location: Optional[str] = None
+    employmentType: Optional[str] = None
+    description: Optional[str] = None
+    salaryMin: Optional[float] = None
+    salaryMax: Optional[float] = None
+    currency: Optional[str] = None
+
+class JobSearchHit(JobSummary):
+    score: float
+
+class JobSuggestion(BaseModel):
+    text: str
+    field: str  # "company" or "title"
+    count: int  # number of jobs carrying this value
+
+class FacetCount(BaseModel):
+    value: str  # can be passed back as the filter value
+    count: int
+
+class SalaryBand(BaseModel):
+    min: float
+    max: Optional[float] = None  # open-ended top band
+    count: int
+
+class JobFacets(BaseModel):
+    total: int
+    location: List[FacetCount]
+    employmentType: List[FacetCount]
+    salary: List[SalaryBand]
+
+class JobFilters(BaseModel):
+    location: Optional[List[str]] = None
+    employmentType: Optional[List[str]] = None
+    minSalary: Optional[float] = None
+    maxSalary: Optional[float] = None
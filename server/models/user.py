@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict
+from typing import List, Optional
 
 class Education(BaseModel):
     school: Optional[str]
@@ -29,9 +29,6 @@ class User(BaseModel):
     experience: Optional[List[Experience]] = []
     gender: Optional[str] = "prefer not to say"
     disability: Optional[str] = "None"
-    embedding: List[float] = None
-    history: List[str] = [] # stores job IDs of applied jobs
-    prior: Dict[str, float] = {} # stores prior preferences like {job_id: str, probability: float}
 
 class UserOut(BaseModel):
     name: str
@@ -45,7 +42,11 @@ class UserOut(BaseModel):
     experience: Optional[List[Experience]] = []
     gender: Optional[str] = None
     disability: Optional[str] = "None"
-    prior: Optional[Dict[str, float]] = {}
+    profile_state: Optional[str] = "ready"  # pending while the embedding and prior are built
+
+class PriorEntry(BaseModel):
+    job_id: str
+    probability: float
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -9,7 +9,7 @@ router = APIRouter()
 @router.post("/signup")
 async def signup(request: Request, user: User):
     db = request.app.state.db
-    await create_user(db, user)
+    created = await create_user(db, user)
     token = create_access_token({"sub": user.email})
 
     log_event("user_signup", {
@@ -19,7 +19,7 @@ async def signup(request: Request, user: User):
         "experience_count": len(user.experience) if user.experience else 0,
     })
     
-    return {"token": token, "msg": "signed in successfully", "status": 200}
+    return {"token": token, "msg": "signed in successfully", "status": 200, "profile_state": created["profile_state"]}
 
 @router.post("/login")
 async def login(request: Request, user: UserLogin):
@@ -0,0 +1,15 @@
+from fastapi import HTTPException, Request
+from server.config.auth_filter import request_claims
+
+def get_current_user_email(request: Request) -> str:
+    """Email (token subject) of the caller, from the claims the auth middleware verified"""
+    auth_header = request.headers.get("authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=403, detail="Not authenticated")
+    claims = request_claims(request)
+    if not claims:
+        raise HTTPException(status_code=403, detail="Invalid token")
+    email = claims.get("sub")
+    if not email:
+        raise HTTPException(status_code=403, detail="Invalid token payload")
+    return email
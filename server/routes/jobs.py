@@ -1,53 +1,212 @@
-from fastapi import APIRouter, Depends, Query, Request, HTTPException
-from typing import List
-from server.models.job import Job
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Hashable, List, Literal, Optional
+import orjson
+from server.models.job import Job, JobFacets, JobFilters, JobSearchHit, JobSuggestion, JobSummary
 from server.services.job_service import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NDJSON_MEDIA_TYPE,
+    build_filter_query,
+    bulk_upsert_jobs,
     create_embedding,
+    facet_jobs,
     filter_jobs,
-    get_all_jobs,
+    get_jobs_page,
+    hybrid_search_jobs,
+    iter_jobs_ndjson,
+    jobs_page_query,
+    listing_projection,
+    search_jobs,
+    suggest_jobs,
     get_job_by_id,
     create_job,
     update_job,
     delete_job
 )
-from server.services.auth_service import decode_access_token
+from server.routes.deps import get_current_user_email
+from server.services.cache_service import SingleFlight, cached, http_date, if_none_match_tags, is_not_modified, make_etag
+from server.services.catalog_service import get_catalog_state
 from server.services.logging_service import log_event
 
 router = APIRouter()
+_page_reads = SingleFlight("job_pages")
 
-def get_current_user(request: Request):
-    auth_header = request.headers.get("authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=403, detail="Not authenticated")
-    token = auth_header.split(" ", 1)[1]
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=403, detail="Invalid token")
-    return payload.get("sub")
-
-@router.get("/", response_model=List[Job])
-async def list_jobs(request: Request):
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def filter_cache_key(search: Optional[List[str]], filters: JobFilters) -> tuple:
+    """Order- and case-insensitive key for a filter query"""
+    terms = tuple(sorted({t.strip().casefold() for t in (search or []) if t and t.strip()}))
+    attrs = tuple(sorted(
+        (k, tuple(sorted(v)) if isinstance(v, list) else v)
+        for k, v in filters.dict(exclude_none=True).items()
+    ))
+    return ("filter", terms, attrs)
+
+async def conditional_json(request: Request, key: Hashable, build):
+    """
+    Serve a JSON body from the job cache with ETag/Last-Modified validators, answering
+    304 without touching Mongo when the client already holds the current version.
+    build() returns (body bytes, item count); returns (response, item count or None).
+    """
     db = request.app.state.db
-    jobs = await get_all_jobs(db)
-    log_event("jobs_listed", {"count": len(jobs)})
-    return jobs
+    version, modified_at = await get_catalog_state(db)
+    headers = {"ETag": make_etag(version, key), "Cache-Control": "no-cache"}
+    if modified_at is not None:
+        headers["Last-Modified"] = http_date(modified_at)
+    if is_not_modified(request.headers, headers["ETag"], modified_at):
+        if "*" in (if_none_match_tags(request.headers) or ()):
+            # "*" only matches a resource that exists: build (cached) so a missing one 404s
+            await cached(key, version, build)
+        return Response(status_code=304, headers=headers), None
+    body, count = await cached(key, version, build)
+    return Response(content=body, media_type="application/json", headers=headers), count
+
+def get_job_filters(
+    location: List[str] = Query(None, description="Locations to restrict to (any of)"),
+    employmentType: List[str] = Query(None, description="Employment types to restrict to (any of)"),
+    minSalary: Optional[float] = Query(None, description="Lowest acceptable salary"),
+    maxSalary: Optional[float] = Query(None, description="Highest acceptable salary"),
+) -> JobFilters:
+    return JobFilters(location=location, employmentType=employmentType, minSalary=minSalary, maxSalary=maxSalary)
+
+@router.get("/", response_model=List[JobSummary], response_model_exclude_unset=True)
+async def list_jobs(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    fields: List[str] = Query(None, description="Fields to return besides id (default: all but embedding/raw)"),
+):
+    """
+    List jobs one page at a time; the next page's cursor is in the X-Next-Cursor header.
+    With `Accept: application/x-ndjson` every job from `cursor` on is streamed instead.
+    """
+    db = request.app.state.db
+    if wants_ndjson(request):
+        # Validate fields and cursor now: once streaming starts the status is already 200
+        projection, query = listing_projection(fields), jobs_page_query(cursor)
+        log_event("jobs_streamed", {"endpoint": "list"})
+        return StreamingResponse(iter_jobs_ndjson(db, query, projection), media_type=NDJSON_MEDIA_TYPE)
+    key = (limit, cursor, tuple(fields or ()))
+    jobs, next_cursor = await _page_reads.do(key, lambda: get_jobs_page(db, limit, cursor, fields))
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    log_event("jobs_listed", {"count": len(jobs), "has_more": next_cursor is not None})
+    # Projected straight from our own collection: skip response_model re-validation
+    return ORJSONResponse(jobs, headers=headers)
 
 @router.get("/filter", response_model=List[Job])
-async def get_filtered_jobs(request: Request, search: List[str] = Query(None, description="List of companies or positions to filter by")):
+async def get_filtered_jobs(
+    request: Request,
+    search: List[str] = Query(None, description="List of companies or positions to filter by"),
+    filters: JobFilters = Depends(get_job_filters),
+):
     db = request.app.state.db
-    jobs = await filter_jobs(db, search)
-    log_event("jobs_filtered", {"search_terms": search, "result_count": len(jobs)})
-    return jobs
+    if wants_ndjson(request):
+        query = await build_filter_query(db, search, filters)
+        log_event("jobs_streamed", {"endpoint": "filter", "search_terms": search})
+        return StreamingResponse(iter_jobs_ndjson(db, query), media_type=NDJSON_MEDIA_TYPE)
+
+    async def build():
+        jobs = await filter_jobs(db, search, filters)
+        return orjson.dumps(jobs), len(jobs)
+
+    response, count = await conditional_json(request, filter_cache_key(search, filters), build)
+    log_event("jobs_filtered", {
+        "search_terms": search,
+        "filters": filters.dict(exclude_none=True),
+        "result_count": count,
+        "not_modified": response.status_code == 304,
+    })
+    return response
+
+@router.get("/facets", response_model=JobFacets)
+async def get_job_facets(
+    request: Request,
+    search: List[str] = Query(None, description="List of companies or positions to filter by"),
+    filters: JobFilters = Depends(get_job_filters),
+):
+    """
+    Job counts per location, employment type and salary band for the current search,
+    for rendering filter options. A field's counts ignore that field's own filter.
+    """
+    db = request.app.state.db
+
+    async def build():
+        facets = await facet_jobs(db, search, filters)
+        return orjson.dumps(facets), facets["total"]
+
+    key = ("facets",) + filter_cache_key(search, filters)[1:]
+    response, total = await conditional_json(request, key, build)
+    log_event("jobs_faceted", {
+        "search_terms": search,
+        "filters": filters.dict(exclude_none=True),
+        "total": total,
+        "not_modified": response.status_code == 304,
+    })
+    return response
+
+@router.get("/search", response_model=List[JobSearchHit], response_model_exclude_unset=True)
+async def search_job_text(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Free-text query over title, company and description"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    mode: Literal["keyword", "hybrid"] = Query("keyword", description="BM25 only, or fused with semantic similarity"),
+    personalize: bool = Query(False, description="Hybrid only: boost jobs by the caller's prior (needs a token)"),
+):
+    """
+    Job search over title, company and description. `keyword` ranks by BM25;
+    `hybrid` fuses BM25 with embedding similarity to the query. The total hit
+    count is in X-Total-Count. Searching is public; only personalizing needs the caller.
+    """
+    db = request.app.state.db
+    headers = {}
+    if mode == "hybrid":
+        user = get_current_user_email(request) if personalize else None
+        hits, total, timings = await hybrid_search_jobs(db, q, limit, offset, user)
+        headers["Server-Timing"] = ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
+    else:
+        hits, total = await search_jobs(db, q, limit, offset)
+        timings = {}
+    headers["X-Total-Count"] = str(total)
+    log_event("jobs_searched", {
+        "query": q,
+        "mode": mode,
+        "offset": offset,
+        "result_count": len(hits),
+        "total": total,
+        "latency_ms": round(sum(timings.values()), 1) if timings else None,
+    })
+    return ORJSONResponse(hits, headers=headers)
+
+@router.get("/suggest", response_model=List[JobSuggestion])
+async def get_suggestions(
+    request: Request,
+    q: str = Query(..., min_length=1, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Typeahead over company names and job titles"""
+    db = request.app.state.db
+    return await suggest_jobs(db, q, limit)
 
 @router.get("/{job_id}", response_model=Job)
 async def get_job(request: Request, job_id: str):
     db = request.app.state.db
-    job = await get_job_by_id(db, job_id)
-    log_event("job_fetched", {"job_id": job_id})
-    return job
+
+    async def build():
+        job = await get_job_by_id(db, job_id)
+        return orjson.dumps(job.dict()), 1
+
+    response, _ = await conditional_json(request, ("job", job_id), build)
+    log_event("job_fetched", {"job_id": job_id, "not_modified": response.status_code == 304})
+    return response
 
 @router.post("/", response_model=Job)
-async def create_new_job(request: Request, job: Job, user: str = Depends(get_current_user)):
+async def create_new_job(request: Request, job: Job, user: str = Depends(get_current_user_email)):
     db = request.app.state.db
     created_job = await create_job(db, job)
     log_event("job_created", {
@@ -58,8 +217,22 @@ async def create_new_job(request: Request, job: Job, user: str = Depends(get_cur
     })
     return created_job
 
+@router.post("/bulk", response_model=dict)
+async def bulk_create_jobs(request: Request, user: str = Depends(get_current_user_email)):
+    """
+    Upsert jobs from an NDJSON request body (one job per line, as written by
+    client/make_json.py). Bad rows are reported per line and do not stop the import.
+    """
+    db = request.app.state.db
+    result = await bulk_upsert_jobs(db, request.stream())
+    log_event("jobs_bulk_ingested", {
+        "created_by": user,
+        **{k: v for k, v in result.items() if k != "errors"},
+    })
+    return result
+
 @router.put("/{job_id}", response_model=Job)
-async def update_existing_job(request: Request, job_id: str, job: Job, user: str = Depends(get_current_user)):
+async def update_existing_job(request: Request, job_id: str, job: Job, user: str = Depends(get_current_user_email)):
     db = request.app.state.db
     updated_job = await update_job(db, job_id, job)
     log_event("job_updated", {
@@ -71,7 +244,7 @@ async def update_existing_job(request: Request, job_id: str, job: Job, user: str
     return updated_job
 
 @router.delete("/{job_id}")
-async def delete_existing_job(request: Request, job_id: str, user: str = Depends(get_current_user)):
+async def delete_existing_job(request: Request, job_id: str, user: str = Depends(get_current_user_email)):
     db = request.app.state.db
     result = await delete_job(db, job_id)
     log_event("job_deleted", {"job_id": job_id, "deleted_by": user})
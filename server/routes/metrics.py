@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from server.services.auth_service import password_hasher, verified_tokens
+from server.services.cache_service import job_cache, singleflight_stats
+
+router = APIRouter()
+
+@router.get("/", response_model=dict)
+async def get_metrics():
+    """In-process counters for caches, request coalescing, password hashing and token verification on this pod"""
+    return {
+        "job_cache": {"size": len(job_cache), "hits": job_cache.hits, "misses": job_cache.misses},
+        "singleflight": singleflight_stats(),
+        "password_hashing": password_hasher.stats(),
+        "token_cache": {"size": len(verified_tokens), "hits": verified_tokens.hits, "misses": verified_tokens.misses},
+    }
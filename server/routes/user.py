@@ -1,16 +1,22 @@
 # routes/user.py
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, EmailStr
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from server.model import get_prior, update_prior
 from server.services.logging_service import log_event
-from server.services.recommendation_service import get_recommendations_for_user
-from server.models.user import UserOut, UserUpdate
-from server.models.job import Job
-from server.services.auth_service import decode_access_token
-from server.services.user_service import update_user
+from server.services.recommendation_service import get_cold_start_recommendations, get_recommendations_for_user
+from server.services.profile_service import PROFILE_READY, build_user_state_now
+from server.models.user import PriorEntry, UserOut, UserUpdate
+from server.models.job import Job, JobFilters
+from server.routes.jobs import get_job_filters
+from server.services.job_service import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.routes.deps import get_current_user_email
+from server.services.user_service import USER_PROFILE_PROJECTION, update_user
+from server.services.user_state_service import delete_user_state, get_prior_page, get_user_state, set_user_state
 from server.services.history_service import (
     add_job_to_history, 
+    get_user_history_ids,
     get_user_history_with_jobs, 
     remove_job_from_history,
     clear_user_history
@@ -30,19 +36,6 @@ class HistoryResponse(BaseModel):
 class PriorUpdateRequest(BaseModel):
     job_id: str
 
-def get_current_user_email(request: Request) -> str:
-    auth_header = request.headers.get("authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=403, detail="Not authenticated")
-    token = auth_header.split(" ", 1)[1]
-    payload = decode_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=403, detail="Invalid token")
-    email = payload.get("sub")
-    if not email:
-        raise HTTPException(status_code=403, detail="Invalid token payload")
-    return email
-
 @router.get("/me", response_model=UserOut)
 async def get_me(
     request: Request,
@@ -51,10 +44,7 @@ async def get_me(
     # Exclude sensitive fields
     print("Fetching profile for:", current_email)
     db = request.app.state.db
-    doc = await db.users.find_one(
-        {"email": current_email},
-        {"_id": 0, "password": 0, "embedding": 0}
-    )
+    doc = await db.users.find_one({"email": current_email}, USER_PROFILE_PROJECTION)
     if not doc:
         raise HTTPException(status_code=404, detail="User not found")
     # If skills is a list, convert to comma-separated string if your UserOut expects str
@@ -95,23 +85,45 @@ async def delete_me(request: Request, current_email: str = Depends(get_current_u
     result = await db.users.delete_one({"email": current_email})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
-    
+    await db.history.delete_many({"email": current_email})
+    await delete_user_state(db, current_email)
+
     log_event("user_account_deleted", {"email": current_email})
     return {"message": "User account deleted successfully"}
 
 # History routes
 @router.get("/history", response_model=List[Dict[str, Any]])
-async def get_history(request: Request, current_email: str = Depends(get_current_user_email)):
-    """Get user's job application history with full job details"""
+async def get_history(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    current_email: str = Depends(get_current_user_email)
+):
+    """
+    Get one page of the user's job application history with job details, newest first.
+    The full length is in X-Total-Count; X-Next-Cursor is set while more pages follow.
+    """
     print("Fetching history for:", current_email)
     db = request.app.state.db
-    history_jobs = await get_user_history_with_jobs(db, current_email)
+    history_jobs, total, next_cursor = await get_user_history_with_jobs(db, current_email, limit, cursor)
+    response.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     log_event("user_history_fetched", {
         "email": current_email,
-        "history_count": len(history_jobs)
+        "history_count": len(history_jobs),
+        "total": total,
+        "paged": cursor is not None
     })
     return history_jobs
 
+@router.get("/history/ids", response_model=List[str])
+async def get_history_ids(request: Request, current_email: str = Depends(get_current_user_email)):
+    """Ids of every job in the user's history, newest first, e.g. to mark applied jobs in a listing"""
+    db = request.app.state.db
+    return await get_user_history_ids(db, current_email)
+
 @router.post("/history", response_model=HistoryResponse)
 async def add_to_history(
     request: Request,
@@ -162,22 +174,37 @@ async def clear_history(request: Request, current_email: str = Depends(get_curre
 
 # Sorts jobs based on similarity to user's profile embedding
 @router.get("/recommendations", response_model=List[Job])
-async def get_recommendations(request: Request, current_email: str = Depends(get_current_user_email)):
-    """Get job recommendations based on user's profile embedding"""
+async def get_recommendations(
+    request: Request,
+    filters: JobFilters = Depends(get_job_filters),
+    current_email: str = Depends(get_current_user_email)
+):
+    """
+    Get job recommendations based on user's profile embedding, optionally filtered by job attributes.
+    Until the profile's prior is built the list is popular recent jobs; X-Profile-State says which.
+    """
     print("Fetching recommendations for:", current_email)
     db = request.app.state.db
-    # Fetch user to get embedding
-    user = await db.users.find_one({"email": current_email})
-    if not user or "embedding" not in user:
-        raise HTTPException(status_code=404, detail="User not found or embedding missing")
-
-    response = await get_recommendations_for_user(db, user)
+    # Only the prior is needed to rank
+    state = await get_user_state(db, current_email, ("prior",))
+    profile_state = PROFILE_READY
+    if state and state.get("prior"):
+        response = await get_recommendations_for_user(db, state, filters)
+    else:
+        # No prior yet (e.g. just signed up): popular recent jobs until the worker is done
+        user = await db.users.find_one({"email": current_email}, {"_id": 0, "profile_state": 1})
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        profile_state = user.get("profile_state", PROFILE_READY)
+        response = await get_cold_start_recommendations(db, current_email, filters)
 
     log_event("recommendations_fetched", {
         "email": current_email,
-        "recommendation_count": len(response)
+        "filters": filters.dict(exclude_none=True),
+        "recommendation_count": len(response),
+        "cold_start": not (state and state.get("prior"))
     })
-    return response
+    return ORJSONResponse(response, headers={"X-Profile-State": profile_state})
 
 @router.post("/recommendations", response_model=dict)
 async def update_priorities(
@@ -187,14 +214,17 @@ async def update_priorities(
     Updates prior based on currently applied jobs and profile embedding.
     """
     db = db_request.app.state.db
-    user = await db.users.find_one({"email": current_email})
-    job = await db.jobs.find_one({"id": request.job_id})
+    state = await get_user_state(db, current_email, ("prior",))
+    job = await db.jobs.find_one({"id": request.job_id}, {"_id": 0, "embedding": 1})
     if not job or "embedding" not in job:
         raise HTTPException(status_code=404, detail="Job not found")
-    if not user or "embedding" not in user:
+    if not state or "prior" not in state:
+        # A profile still waiting for the worker is built now: the update needs its prior
+        state = await build_user_state_now(db, current_email) or state
+    if not state:
         raise HTTPException(status_code=404, detail="User not found or embedding missing")
-    new_prior = await update_prior(db, user["prior"], job["embedding"])
-    await db.users.update_one({"email": current_email}, {"$set": {"prior": new_prior}})
+    new_prior = await update_prior(db, state.get("prior") or {}, job["embedding"])
+    await set_user_state(db, current_email, prior=new_prior)
     
     log_event("prior_updated", {
         "email": current_email,
@@ -207,15 +237,37 @@ async def update_priorities(
 async def reset_recommendations(request: Request, current_email: str = Depends(get_current_user_email)):
     """Reset user recommendations to initial state"""
     db = request.app.state.db
-    user = await db.users.find_one({"email": current_email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Reset the user's prior distribution
-    db = request.app.state.db
-    new_prior = await get_prior(db, user["embedding"]) if "embedding" in user else {}
-    await db.users.update_one({"email": current_email}, {"$set": {"prior": new_prior}})
+    state = await get_user_state(db, current_email, ("embedding",))
+    if state and "embedding" in state:
+        # Reset the user's prior distribution
+        new_prior = await get_prior(db, state["embedding"]) or {}
+        await set_user_state(db, current_email, prior=new_prior)
+    elif await build_user_state_now(db, current_email) is None:
+        # (a pending profile just got its initial prior built, which is the reset)
+        if not state:
+            raise HTTPException(status_code=404, detail="User not found")
+        await set_user_state(db, current_email, prior={})
     log_event("recommendations_reset", {
         "email": current_email
     })
-    return {"message": "Recommendations reset successfully"}
\ No newline at end of file
+    return {"message": "Recommendations reset successfully"}
+
+@router.get("/prior", response_model=List[PriorEntry])
+async def get_user_prior(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_email: str = Depends(get_current_user_email)
+):
+    """One page of the user's prior over jobs; the number of entries is in X-Total-Count"""
+    db = request.app.state.db
+    entries, total = await get_prior_page(db, current_email, limit, offset)
+    response.headers["X-Total-Count"] = str(total)
+    log_event("user_prior_fetched", {
+        "email": current_email,
+        "entry_count": len(entries),
+        "total": total,
+        "offset": offset
+    })
+    return entries
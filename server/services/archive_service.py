@@ -0,0 +1,120 @@
+# services/archive_service.py
+import asyncio
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from pymongo import ReplaceOne, UpdateOne
+from server.services.catalog_service import invalidate_catalog
+from server.services.recommendation_service import del_priors_for_all_users
+from server.services.search_service import unindex_job
+from server.services.logging_service import log_event
+
+# Jobs posted more than JOB_ACTIVE_DAYS ago are moved to jobs_archive. Expiry is
+# opt-in (0 disables it): set it on the one instance that should run the sweeper.
+JOB_ACTIVE_DAYS = float(os.environ.get("JOB_ACTIVE_DAYS", "0"))
+JOB_SWEEP_INTERVAL = float(os.environ.get("JOB_SWEEP_INTERVAL", "3600"))
+SWEEP_BATCH_SIZE = 500
+
+POSTED_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%b %d, %Y", "%d %b %Y", "%B %d, %Y", "%d %B %Y")
+_RELATIVE = re.compile(r"(\d+)\+?\s*(minute|hour|day|week|month)s?\s+ago")
+_UNIT_DAYS = {"minute": 1 / 1440, "hour": 1 / 24, "day": 1, "week": 7, "month": 30}
+
+
+def parse_posted(value, now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Parse the feed's `posted` value: ISO and common calendar dates, or relative
+    ones like '3 days ago' (relative to `now`). Returns an aware UTC datetime.
+    """
+    now = now or datetime.now(timezone.utc)
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    text = str(value or "").strip()
+    if not text:
+        return None
+    lowered = text.lower()
+    if lowered in ("today", "just posted", "just now"):
+        return now
+    if lowered == "yesterday":
+        return now - timedelta(days=1)
+    match = _RELATIVE.search(lowered)
+    if match:
+        return now - timedelta(days=int(match.group(1)) * _UNIT_DAYS[match.group(2)])
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        parsed = None
+        for fmt in POSTED_FORMATS:
+            try:
+                parsed = datetime.strptime(text, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is None:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def posted_at(doc: dict) -> datetime:
+    """When a job went live: its parsed `posted` date, else the time we first stored it."""
+    return parse_posted(doc.get("posted")) or parse_posted(doc.get("postedAt")) or datetime.now(timezone.utc)
+
+
+async def backfill_posted_at(db, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """Give jobs stored before postedAt existed one, so the sweeper can age them."""
+    filled = 0
+    while True:
+        docs = await db.jobs.find({"postedAt": {"$exists": False}}, {"_id": 1, "posted": 1}).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            return filled
+        await db.jobs.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": {"postedAt": posted_at(doc)}}) for doc in docs],
+            ordered=False,
+        )
+        filled += len(docs)
+
+
+async def archive_expired_jobs(db, active_days: float = JOB_ACTIVE_DAYS, batch_size: int = SWEEP_BATCH_SIZE) -> int:
+    """
+    Move jobs posted before the active window into jobs_archive and drop them from
+    the catalog, the search indexes and every user's prior. Archived jobs keep their
+    job_details, so history can still show them in full.
+    """
+    if active_days <= 0:
+        return 0
+    await backfill_posted_at(db, batch_size)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=active_days)
+    archived: List[str] = []
+    while True:
+        docs = await db.jobs.find({"postedAt": {"$lt": cutoff}}, {"embedding": 0}).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+        # Archive copy first: an interrupted sweep leaves a job in both, never in neither
+        await db.jobs_archive.bulk_write(
+            [ReplaceOne({"id": doc["id"]}, {k: v for k, v in doc.items() if k != "_id"}, upsert=True) for doc in docs],
+            ordered=False,
+        )
+        await db.jobs.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        archived += [doc["id"] for doc in docs]
+    if archived:
+        await invalidate_catalog(db)
+        for job_id in archived:
+            unindex_job(job_id)
+        await del_priors_for_all_users(db, archived)
+    return len(archived)
+
+
+async def run_archive_sweeper(db, interval: float = JOB_SWEEP_INTERVAL):
+    """Archive expired jobs every `interval` seconds until cancelled."""
+    while True:
+        started = datetime.now(timezone.utc)
+        try:
+            count = await archive_expired_jobs(db)
+            log_event("jobs_archived", {
+                "count": count,
+                "active_days": JOB_ACTIVE_DAYS,
+                "duration_ms": round((datetime.now(timezone.utc) - started).total_seconds() * 1000, 1),
+            })
+        except Exception as e:
+            log_event("jobs_archive_failed", {"error": str(e)})
+        await asyncio.sleep(interval)
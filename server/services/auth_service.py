@@ -1,5 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
 from jose import jwt, JWTError
+from typing import Optional
+from server.services.cache_service import LRUCache
+import asyncio
 import os
+import time
 import dotenv
 import bcrypt
 
@@ -7,6 +13,13 @@ dotenv.load_dotenv()
 
 SECRET_KEY = os.environ.get("SECRET_ACCESS_TOKEN", "secret")
 ALGORITHM = "HS256"
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so hashes run in parallel on this many threads
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hashes waiting for a thread beyond this many are refused with a 503
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "64"))
+# Recently verified tokens, so polling clients skip the HMAC check
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "1024"))
 
 def verify_password(plain_password: str, stored_password: str) -> bool:
     """Verify a plain password against a hashed password using bcrypt"""
@@ -25,13 +38,88 @@ def get_password_hash(password: str) -> str:
         raise ValueError("Password must be a string")
     
     # Generate salt and hash the password
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     password_bytes = password.encode('utf-8')
     hashed = bcrypt.hashpw(password_bytes, salt)
     
     # Return as string for storage
     return hashed.decode('utf-8')
 
+def password_needs_rehash(stored_password: str) -> bool:
+    """Whether a stored hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        return int(stored_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded thread pool so a burst of logins never stalls the
+    event loop, shedding load once too many hashes are queued.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0  # running or waiting for a thread
+        self.completed = 0
+        self.rejected = 0
+        self.wait_ms_total = 0.0
+        self.max_wait_ms = 0.0
+        self.run_ms_total = 0.0
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many concurrent logins", headers={"Retry-After": "1"})
+
+        def timed():
+            started = time.perf_counter()
+            return fn(*args), started, time.perf_counter()
+
+        self.in_flight += 1
+        submitted = time.perf_counter()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        # A cancelled caller leaves the thread hashing: count it until the hash is done
+        future.add_done_callback(self._finished)
+        result, started, finished = await asyncio.shield(future)
+        wait_ms = (started - submitted) * 1000
+        self.completed += 1
+        self.wait_ms_total += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.run_ms_total += (finished - started) * 1000
+        return result
+
+    def _finished(self, future):
+        self.in_flight -= 1
+        if not future.cancelled():
+            future.exception()  # retrieved here in case its caller is gone
+
+    def stats(self) -> dict:
+        done = max(self.completed, 1)
+        return {
+            "workers": self.workers,
+            "rounds": BCRYPT_ROUNDS,
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_ms_total / done, 1),
+            "max_wait_ms": round(self.max_wait_ms, 1),
+            "avg_hash_ms": round(self.run_ms_total / done, 1),
+        }
+
+password_hasher = PasswordHasher()
+
+async def check_password(plain_password: str, stored_password: str) -> bool:
+    """verify_password on the hashing pool"""
+    return await password_hasher.run(verify_password, plain_password, stored_password)
+
+async def hash_password(password: str) -> str:
+    """get_password_hash on the hashing pool"""
+    return await password_hasher.run(get_password_hash, password)
+
 def create_access_token(data: dict):
     return jwt.encode(data, SECRET_KEY, algorithm=ALGORITHM)
 
@@ -42,3 +130,20 @@ def decode_access_token(token: str):
     except JWTError:
         return None
 
+verified_tokens = LRUCache(TOKEN_CACHE_SIZE)
+
+def verify_access_token(token: str) -> Optional[dict]:
+    """decode_access_token, remembering valid tokens until they expire"""
+    payload = verified_tokens.get(token)
+    if payload is not None and ("exp" not in payload or payload["exp"] > time.time()):
+        return payload
+    payload = decode_access_token(token)
+    if payload is not None:
+        verified_tokens.set(token, payload)
+    return payload
+
+def bearer_claims(authorization: Optional[str]) -> Optional[dict]:
+    """Claims of a valid `Bearer <jwt>` authorization header, else None"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    return verify_access_token(authorization.split(" ", 1)[1])
@@ -0,0 +1,140 @@
+# services/cache_service.py
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+JOB_CACHE_SIZE = int(os.environ.get("JOB_CACHE_SIZE", "5000"))
+
+
+class LRUCache:
+    """Bounded least-recently-used mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key: the first caller starts the work,
+    later callers await the same in-flight task instead of repeating it.
+    """
+
+    instances: Dict[str, "SingleFlight"] = {}
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.deduplicated = 0
+        SingleFlight.instances[name] = self
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]):
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+
+            def forget(done, key=key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            task.add_done_callback(forget)
+        else:
+            self.deduplicated += 1
+        # A cancelled caller must not cancel the work other callers are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "deduplicated": self.deduplicated, "in_flight": len(self._inflight)}
+
+
+def singleflight_stats() -> dict:
+    return {name: flight.stats() for name, flight in SingleFlight.instances.items()}
+
+
+# Serialized job detail and filter responses, tagged with the catalog version they were built at
+job_cache = LRUCache(JOB_CACHE_SIZE)
+_job_reads = SingleFlight("job_reads")
+
+
+async def cached(key: Hashable, version: int, build):
+    """
+    Return the cached value for `key` at `version`. On a miss, concurrent callers
+    share a single build().
+    """
+    entry = job_cache.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    async def build_and_store():
+        value = await build()
+        job_cache.set(key, (version, value))
+        return value
+
+    return await _job_reads.do((key, version), build_and_store)
+
+
+def make_etag(version: int, key: Hashable) -> str:
+    """Strong validator for `key` that changes whenever the catalog version does."""
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+    return f'"{version}-{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value, usegmt=True)
+
+
+def if_none_match_tags(headers) -> Optional[List[str]]:
+    """Entity tags of the If-None-Match header, or None without one."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is None:
+        return None
+    return [t.strip() for t in if_none_match.split(",")]
+
+
+def is_not_modified(headers, etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    Evaluate If-None-Match (preferred) or If-Modified-Since for a GET. "*" matches
+    any current representation: callers must check the resource exists first.
+    """
+    tags = if_none_match_tags(headers)
+    if tags is not None:
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
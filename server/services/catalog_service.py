@@ -0,0 +1,514 @@
+# services/catalog_service.py
+import os
+import re
+import tempfile
+import time
+import numpy as np
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from typing import Dict, List, Optional, Tuple
+from server.models.job import JobFilters
+from server.services.cache_service import SingleFlight
+from server.services.logging_service import log_event
+
+# Fields needed to build the resident catalog (never the description or raw row)
+CATALOG_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "embedding": 1,
+    "location": 1,
+    "employmentType": 1,
+    "salaryMin": 1,
+    "salaryMax": 1,
+}
+
+# Common spellings that should land in the same location bucket
+LOCATION_ALIASES = {
+    "bangalore": "bengaluru",
+    "bombay": "mumbai",
+    "calcutta": "kolkata",
+    "madras": "chennai",
+    "gurgaon": "gurugram",
+    "work from home": "remote",
+    "wfh": "remote",
+}
+
+# Lower bounds of the salary facet bands; the last band is open-ended
+SALARY_FACET_BANDS = [
+    float(b) for b in os.environ.get("JOB_FACET_SALARY_BANDS", "0,50000,100000,200000,500000,1000000").split(",")
+]
+
+# Two-stage scoring: a PCA projection to CATALOG_PCA_DIM dims ranks the whole catalog,
+# then the best RERANK_FACTOR * k rows are re-scored on full vectors (0 = exact only)
+CATALOG_PCA_DIM = int(os.environ.get("CATALOG_PCA_DIM", "0"))
+CATALOG_PCA_SAMPLE = int(os.environ.get("CATALOG_PCA_SAMPLE", "20000"))
+# Refit once the catalog has grown or shrunk by this fraction since the last fit
+CATALOG_PCA_REFIT_DRIFT = float(os.environ.get("CATALOG_PCA_REFIT_DRIFT", "0.25"))
+RERANK_FACTOR = int(os.environ.get("CATALOG_RERANK_FACTOR", "10"))
+RERANK_MIN = 200
+PROJECTION_META_ID = "catalog_projection"
+# "int8" keeps the job matrix as per-row scaled int8 codes (4x smaller); full-precision
+# rows for re-ranking are then spilled to a memory-mapped temp file unless disabled
+CATALOG_QUANTIZE = os.environ.get("CATALOG_QUANTIZE", "none")
+CATALOG_FLOAT_SPILL = os.environ.get("CATALOG_FLOAT_SPILL", "1") == "1"
+CATALOG_SPILL_DIR = os.environ.get("CATALOG_SPILL_DIR") or None
+QUANTIZED_BLOCK_ROWS = 512
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_attr(value) -> str:
+    """Lowercase and collapse punctuation/whitespace: 'Full-Time ' -> 'full time'"""
+    if value is None:
+        return ""
+    return _NON_ALNUM.sub(" ", str(value).lower()).strip()
+
+
+def normalize_location(value) -> List[str]:
+    """
+    Return every key a location should be findable under, e.g.
+    'Bangalore, Karnataka' -> ['bengaluru karnataka', 'bengaluru', 'karnataka'].
+    """
+    parts = [normalize_attr(p) for p in re.split(r"[,/|;]", str(value or ""))]
+    parts = [LOCATION_ALIASES.get(p, p) for p in parts if p]
+    keys = []
+    if len(parts) > 1:
+        keys.append(" ".join(parts))
+    for p in parts:
+        if p not in keys:
+            keys.append(p)
+    return keys
+
+
+def has_filters(filters: Optional[JobFilters]) -> bool:
+    return filters is not None and any(
+        v not in (None, []) for v in filters.dict().values()
+    )
+
+
+def _intersect(a: Optional[np.ndarray], b: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """Intersect sorted row arrays, where None stands for every row."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class AttributeIndex:
+    """Inverted index from job attributes to catalog row numbers."""
+
+    FACET_FIELDS = ("location", "employmentType")
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, List[int]]] = {"location": {}, "employmentType": {}}
+        # Facets count each row once, under its most specific key
+        self.labels: Dict[str, Dict[str, str]] = {f: {} for f in self.FACET_FIELDS}
+        self._facet_keys: Dict[str, List[Optional[str]]] = {f: [] for f in self.FACET_FIELDS}
+        self.facet_values: Dict[str, List[str]] = {f: [] for f in self.FACET_FIELDS}
+        self.facet_codes: Dict[str, np.ndarray] = {f: np.empty(0, dtype=np.int64) for f in self.FACET_FIELDS}
+        self._salary_min: List[float] = []
+        self._salary_max: List[float] = []
+        self.salary_min = np.empty(0, dtype=np.float64)
+        self.salary_max = np.empty(0, dtype=np.float64)
+
+    def add(self, row: int, job: dict):
+        locations = normalize_location(job.get("location"))
+        for key in locations:
+            self.postings["location"].setdefault(key, []).append(row)
+        etype = normalize_attr(job.get("employmentType"))
+        if etype:
+            self.postings["employmentType"].setdefault(etype, []).append(row)
+        for field, key in (("location", locations[0] if locations else None), ("employmentType", etype or None)):
+            self._facet_keys[field].append(key)
+            if key is not None:
+                self.labels[field].setdefault(key, str(job.get(field)).strip())
+        lo, hi = _to_float(job.get("salaryMin")), _to_float(job.get("salaryMax"))
+        # A single bound describes a fixed salary
+        self._salary_min.append(lo if not np.isnan(lo) else hi)
+        self._salary_max.append(hi if not np.isnan(hi) else lo)
+
+    def freeze(self):
+        """Convert the posting lists into sorted int arrays once loading is done."""
+        for field in self.postings:
+            self.postings[field] = {
+                k: np.asarray(rows, dtype=np.int64) for k, rows in self.postings[field].items()
+            }
+        for field, keys in self._facet_keys.items():
+            values = sorted({k for k in keys if k is not None})
+            code_of = {k: i for i, k in enumerate(values)}
+            self.facet_values[field] = values
+            self.facet_codes[field] = np.asarray([code_of.get(k, -1) for k in keys], dtype=np.int64)
+        self._facet_keys = {f: [] for f in self.FACET_FIELDS}
+        self.salary_min = np.asarray(self._salary_min, dtype=np.float64)
+        self.salary_max = np.asarray(self._salary_max, dtype=np.float64)
+        self._salary_min, self._salary_max = [], []
+
+    def _lookup(self, field: str, values: List[str]) -> np.ndarray:
+        if field == "location":
+            keys = [k for v in values for k in normalize_location(v)[:1]]
+        else:
+            keys = [normalize_attr(v) for v in values]
+        hits = [self.postings[field][k] for k in keys if k in self.postings[field]]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        return hits[0] if len(hits) == 1 else np.unique(np.concatenate(hits))
+
+    def rows(self, filters: Optional[JobFilters]) -> Optional[np.ndarray]:
+        """
+        Sorted row numbers matching the filters, or None when nothing is filtered.
+        Values within a field are OR-ed, fields are AND-ed together.
+        """
+        if not has_filters(filters):
+            return None
+        rows = None
+        for field in ("location", "employmentType"):
+            values = getattr(filters, field)
+            if values:
+                hit = self._lookup(field, values)
+                rows = hit if rows is None else np.intersect1d(rows, hit, assume_unique=True)
+        if filters.minSalary is not None or filters.maxSalary is not None:
+            if rows is None:
+                rows = np.arange(len(self.salary_min))
+            if filters.minSalary is not None:
+                rows = rows[self.salary_max[rows] >= filters.minSalary]
+            if filters.maxSalary is not None:
+                rows = rows[self.salary_min[rows] <= filters.maxSalary]
+        return rows
+
+    def value_counts(self, field: str, rows: Optional[np.ndarray]) -> List[Tuple[str, int]]:
+        """(display value, count) for every value of `field` among `rows`, most common first."""
+        codes = self.facet_codes[field] if rows is None else self.facet_codes[field][rows]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.facet_values[field]))
+        order = sorted(np.flatnonzero(counts), key=lambda i: (-counts[i], self.facet_values[field][i]))
+        return [(self.labels[field][self.facet_values[field][i]], int(counts[i])) for i in order]
+
+    def salary_band_counts(self, rows: Optional[np.ndarray], bands: List[float]) -> List[Tuple[float, Optional[float], int]]:
+        """
+        (band min, band max, count) per salary band. A job is counted in every band its
+        range overlaps, matching what minSalary/maxSalary return for that band.
+        """
+        lo = self.salary_min if rows is None else self.salary_min[rows]
+        hi = self.salary_max if rows is None else self.salary_max[rows]
+        counts = []
+        for i, band_min in enumerate(bands):
+            band_max = bands[i + 1] if i + 1 < len(bands) else None
+            hit = hi >= band_min
+            if band_max is not None:
+                hit &= lo <= band_max
+            counts.append((band_min, band_max, int(np.count_nonzero(hit))))
+        return counts
+
+    def facets(self, filters: Optional[JobFilters], rows: Optional[np.ndarray] = None) -> dict:
+        """
+        Facet counts among `rows` (None for all) under `filters`. Each field's counts
+        ignore that field's own filter, so picking one value keeps its siblings visible.
+        """
+        filters = filters or JobFilters()
+        result = {"total": len(self.salary_min) if rows is None else len(rows)}
+        selected = self.rows(filters)
+        if selected is not None:
+            result["total"] = len(_intersect(rows, selected))
+        for field in self.FACET_FIELDS:
+            others = self.rows(filters.copy(update={field: None}))
+            result[field] = [
+                {"value": value, "count": count}
+                for value, count in self.value_counts(field, _intersect(rows, others))
+            ]
+        others = self.rows(filters.copy(update={"minSalary": None, "maxSalary": None}))
+        result["salary"] = [
+            {"min": lo, "max": hi, "count": count}
+            for lo, hi, count in self.salary_band_counts(_intersect(rows, others), SALARY_FACET_BANDS)
+        ]
+        return result
+
+
+class QuantizedMatrix:
+    """
+    Row-major int8 codes with one float scale per row (row ~= codes * scale), usable
+    where the catalog matrix is: `m @ x` scans the codes, `m[rows]` returns float32
+    rows, exact ones from the spill file when there is one.
+    """
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray, exact: Optional[np.ndarray] = None, spill_file=None):
+        self.codes = codes
+        self.scales = scales
+        self.exact = exact
+        self._spill_file = spill_file  # keeps the memory map's file alive
+
+    @classmethod
+    def from_float(cls, matrix: np.ndarray, spill: bool = CATALOG_FLOAT_SPILL, spill_dir: Optional[str] = CATALOG_SPILL_DIR) -> "QuantizedMatrix":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(matrix / scales[:, None]).astype(np.int8)
+        exact = spill_file = None
+        if spill and len(matrix):
+            spill_file = tempfile.TemporaryFile(dir=spill_dir)
+            spill_file.write(np.ascontiguousarray(matrix, dtype=np.float32).tobytes())
+            spill_file.flush()
+            exact = np.memmap(spill_file, dtype=np.float32, mode="r", shape=matrix.shape)
+        return cls(codes, scales.astype(np.float32), exact, spill_file)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if self.exact is not None:
+            return np.asarray(self.exact[rows])
+        return self.codes[rows].astype(np.float32) * self.scales[rows, None]
+
+    def __matmul__(self, other: np.ndarray) -> np.ndarray:
+        return self.scan(other)
+
+    def scan(self, other: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate `self[rows] @ other` computed from the int8 codes."""
+        codes = self.codes if rows is None else self.codes[rows]
+        scales = self.scales if rows is None else self.scales[rows]
+        # numpy has no int8 GEMM, so widen one block at a time: BLAS speed, small temporaries
+        other = np.asarray(other, dtype=np.float32)
+        out = np.empty((len(codes),) + other.shape[1:], dtype=np.float32)
+        for start in range(0, len(codes), QUANTIZED_BLOCK_ROWS):
+            block = slice(start, start + QUANTIZED_BLOCK_ROWS)
+            scores = codes[block].astype(np.float32) @ other
+            out[block] = scores * (scales[block] if other.ndim == 1 else scales[block, None])
+        return out
+
+
+class Projection:
+    """PCA projection of the job embeddings: x -> components @ (x - mean)."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, catalog_rows: int, catalog_version: int):
+        self.mean = mean
+        self.components = components
+        self.catalog_rows = catalog_rows
+        self.catalog_version = catalog_version
+
+    @property
+    def dim(self) -> int:
+        return self.components.shape[0]
+
+    def transform(self, matrix: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray((matrix - self.mean) @ self.components.T)
+
+    def project_query(self, q: np.ndarray) -> np.ndarray:
+        # q . (x - mean) ranks like q . x, so the query needs no centering
+        return self.components @ q
+
+    def to_document(self) -> dict:
+        return {
+            "_id": PROJECTION_META_ID,
+            "dim": self.dim,
+            "inputDim": self.components.shape[1],
+            "mean": self.mean.astype(np.float32).tobytes(),
+            "components": self.components.astype(np.float32).tobytes(),
+            "catalogRows": self.catalog_rows,
+            "catalogVersion": self.catalog_version,
+        }
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "Projection":
+        mean = np.frombuffer(doc["mean"], dtype=np.float32)
+        components = np.frombuffer(doc["components"], dtype=np.float32).reshape(doc["dim"], doc["inputDim"])
+        return cls(mean, components, doc["catalogRows"], doc["catalogVersion"])
+
+
+def fit_projection(matrix: np.ndarray, dim: int, version: int, sample: int = CATALOG_PCA_SAMPLE, seed: int = 0) -> Projection:
+    """Fit a PCA projection on (a sample of) the catalog matrix."""
+    rows = len(matrix)
+    if rows > sample:
+        matrix = matrix[np.random.default_rng(seed).choice(rows, sample, replace=False)]
+    mean = matrix.mean(axis=0)
+    _, _, vt = np.linalg.svd(matrix - mean, full_matrices=False)
+    return Projection(mean.astype(np.float32), np.ascontiguousarray(vt[:dim], dtype=np.float32), rows, version)
+
+
+async def ensure_projection(db, matrix: np.ndarray, version: int, dim: Optional[int] = None) -> Optional[Projection]:
+    """
+    The persisted projection, refitted (and saved with the catalog version it was
+    fitted on) when missing, of the wrong shape, or fitted on a catalog that has
+    since drifted by more than CATALOG_PCA_REFIT_DRIFT.
+    """
+    dim = CATALOG_PCA_DIM if dim is None else dim
+    if dim <= 0 or dim >= matrix.shape[1] or len(matrix) <= dim:
+        return None
+    doc = await db.meta.find_one({"_id": PROJECTION_META_ID})
+    if doc and doc.get("dim") == dim and doc.get("inputDim") == matrix.shape[1]:
+        projection = Projection.from_document(doc)
+        if abs(len(matrix) - projection.catalog_rows) <= CATALOG_PCA_REFIT_DRIFT * projection.catalog_rows:
+            return projection
+    projection = fit_projection(matrix, dim, version)
+    log_event("catalog_projection_fitted", {"dim": dim, "catalog_rows": len(matrix), "catalog_version": version})
+    await db.meta.replace_one({"_id": PROJECTION_META_ID}, projection.to_document(), upsert=True)
+    return projection
+
+
+class Catalog:
+    """Snapshot of all embedded jobs: ids, L2-normalized matrix and attribute index."""
+
+    def __init__(self, ids: List[str], matrix: np.ndarray, index: AttributeIndex, version: int,
+                 projection: Optional[Projection] = None):
+        self.ids = ids
+        self.matrix = matrix
+        self.index = index
+        self.version = version
+        self.row_of = {job_id: row for row, job_id in enumerate(ids)}
+        self.projection = projection
+        self.reduced = projection.transform(matrix) if projection is not None else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, filters: Optional[JobFilters]) -> Optional[np.ndarray]:
+        return self.index.rows(filters)
+
+    def facets(self, filters: Optional[JobFilters], rows: Optional[np.ndarray] = None) -> dict:
+        return self.index.facets(filters, rows)
+
+    def rows_of(self, ids) -> np.ndarray:
+        """Sorted catalog rows of the given job ids (ids not in the catalog are skipped)."""
+        return np.asarray(sorted(self.row_of[i] for i in ids if i in self.row_of), dtype=np.int64)
+
+    def subset(self, rows: Optional[np.ndarray]) -> Tuple[np.ndarray, List[str]]:
+        """Matrix and ids restricted to `rows` (the whole catalog when rows is None)."""
+        if rows is None:
+            return self.matrix, self.ids
+        return self.matrix[rows], [self.ids[r] for r in rows]
+
+    def scores(self, query_vec, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of the query against the catalog (or just `rows`)."""
+        q = np.asarray(query_vec, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return matrix @ q
+
+    def top_k(self, query_vec, k: int, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The k catalog rows (restricted to `rows`) most similar to the query and their
+        exact cosine scores, best first. With a projection (or an int8 matrix) the whole
+        set is ranked approximately first and only the best RERANK_FACTOR * k rows are
+        scored on full float vectors.
+        """
+        q = np.asarray(query_vec, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) or 1.0)
+        candidates = np.arange(len(self)) if rows is None else np.asarray(rows)
+        k = min(k, len(candidates))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        shortlist = max(k * RERANK_FACTOR, RERANK_MIN)
+        if shortlist < len(candidates):
+            approx = None
+            if self.reduced is not None:
+                reduced = self.reduced if rows is None else self.reduced[candidates]
+                approx = reduced @ self.projection.project_query(q)
+            elif isinstance(self.matrix, QuantizedMatrix):
+                approx = self.matrix.scan(q, rows=None if rows is None else candidates)
+            if approx is not None:
+                candidates = candidates[np.argpartition(-approx, shortlist - 1)[:shortlist]]
+        exact = self.matrix[candidates] @ q
+        top = np.argpartition(-exact, k - 1)[:k] if k < len(exact) else np.arange(len(exact))
+        top = top[np.argsort(-exact[top], kind="stable")]
+        return candidates[top], exact[top]
+
+
+async def load_catalog(db, version: int = 0) -> Catalog:
+    ids, vectors = [], []
+    index = AttributeIndex()
+    # Flagged near-duplicates stay listable but are never scored
+    query = {"embedding": {"$exists": True}, "duplicateOf": {"$exists": False}}
+    async for job in db.jobs.find(query, CATALOG_PROJECTION):
+        if not job.get("embedding"):
+            continue
+        index.add(len(ids), job)
+        ids.append(str(job["id"]))
+        vectors.append(job["embedding"])
+    index.freeze()
+    if not vectors:
+        return Catalog(ids, np.empty((0, 0), dtype=np.float32), index, version)
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    catalog = Catalog(ids, matrix, index, version, await ensure_projection(db, matrix, version))
+    if CATALOG_QUANTIZE == "int8":
+        catalog.matrix = QuantizedMatrix.from_float(matrix)
+    return catalog
+
+
+# The catalog version lives in Mongo so every pod sees every job write
+CATALOG_META_ID = "catalog"
+VERSION_CHECK_INTERVAL = float(os.environ.get("CATALOG_VERSION_CHECK_INTERVAL", "1"))
+
+_catalog: Optional[Catalog] = None
+_catalog_loads = SingleFlight("catalog_load")
+_version = 0
+_modified_at: Optional[datetime] = None
+_checked_at = 0.0
+
+
+def _remember(meta: Optional[dict]):
+    global _version, _modified_at, _checked_at
+    meta = meta or {}
+    _version = meta.get("version", 0)
+    modified_at = meta.get("modifiedAt")
+    if modified_at is not None and modified_at.tzinfo is None:
+        modified_at = modified_at.replace(tzinfo=timezone.utc)  # pymongo returns naive UTC
+    _modified_at = modified_at
+    _checked_at = time.monotonic()
+
+
+async def invalidate_catalog(db):
+    """Bump the catalog version; called after every job write."""
+    meta = await db.meta.find_one_and_update(
+        {"_id": CATALOG_META_ID},
+        {"$inc": {"version": 1}, "$currentDate": {"modifiedAt": True}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    _remember(meta)
+
+
+async def get_catalog_state(db) -> Tuple[int, Optional[datetime]]:
+    """
+    Current (catalog version, time of the last job write). Other pods' writes are
+    picked up within VERSION_CHECK_INTERVAL seconds.
+    """
+    if time.monotonic() - _checked_at > VERSION_CHECK_INTERVAL:
+        _remember(await db.meta.find_one({"_id": CATALOG_META_ID}))
+    return _version, _modified_at
+
+
+async def get_catalog(db) -> Catalog:
+    """Return the resident catalog, reloading it if a job write made it stale."""
+    global _catalog
+    version, _ = await get_catalog_state(db)
+    if _catalog is None or _catalog.version != version:
+        # A cold start or version bump triggers one reload, however many requests ask
+        _catalog = await _catalog_loads.do(version, lambda: load_catalog(db, version))
+    return _catalog
+
+
+async def get_resident_catalog(db) -> Catalog:
+    """
+    The catalog already in memory, even if a later write made it stale; loads it
+    only on a cold start. For checks that tolerate missing the newest jobs.
+    """
+    return _catalog if _catalog is not None else await get_catalog(db)
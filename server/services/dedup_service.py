@@ -0,0 +1,296 @@
+# services/dedup_service.py
+import os
+import re
+import zlib
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pymongo import UpdateOne
+from server.services.catalog_service import Catalog, get_catalog, get_resident_catalog, invalidate_catalog
+from server.services.recommendation_service import del_priors_for_all_users
+from server.services.search_service import unindex_job
+
+# What ingest does with a near-duplicate: "flag" stores it marked duplicateOf (kept
+# out of the catalog), "merge" folds it into the original as an alias, "off" skips checks
+DEDUP_MODE = os.environ.get("JOB_DEDUP_MODE", "flag")
+DEDUP_SIMILARITY = float(os.environ.get("JOB_DEDUP_SIMILARITY", "0.95"))
+DEDUP_SHINGLE_JACCARD = float(os.environ.get("JOB_DEDUP_SHINGLE_JACCARD", "0.5"))
+LSH_TABLES = int(os.environ.get("JOB_DEDUP_LSH_TABLES", "8"))
+LSH_BITS = int(os.environ.get("JOB_DEDUP_LSH_BITS", "12"))
+LSH_SEED = 20240501
+SHINGLE_SIZE = 3
+# Compare the same span on both sides: hot documents only keep a description preview
+SHINGLE_TEXT_CHARS = 500
+DEDUP_TEXT_PROJECTION = {"_id": 0, "id": 1, "title": 1, "company": 1, "description": 1, "postedAt": 1}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(doc: dict) -> Set[int]:
+    """Hashed word 3-shingles of a job's title, company and description start."""
+    text = " ".join(str(doc.get(f) or "") for f in ("title", "company"))
+    text += " " + str(doc.get("description") or "")[:SHINGLE_TEXT_CHARS]
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(" ".join(words).encode())}
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_SIZE]).encode()) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, np.shape(vectors)[-1])
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LSHIndex:
+    """
+    Random-hyperplane LSH: vectors whose cosine similarity is high land in the
+    same bucket of at least one table with high probability.
+    """
+
+    def __init__(self, dim: int, tables: int = LSH_TABLES, bits: int = LSH_BITS, seed: int = LSH_SEED):
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((dim, tables * bits)).astype(np.float32)
+        self.tables, self.bits = tables, bits
+        self._weights = (1 << np.arange(bits, dtype=np.int64))
+        self.buckets: List[Dict[int, List[int]]] = [{} for _ in range(tables)]
+        self.size = 0
+
+    def keys(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, tables) bucket keys: one sign bit per hyperplane, packed per table."""
+        bits = (vectors @ self.planes > 0).reshape(len(vectors), self.tables, self.bits)
+        return bits.astype(np.int64) @ self._weights
+
+    def add(self, vectors: np.ndarray) -> "LSHIndex":
+        """Append vectors as rows size, size + 1, ..."""
+        if len(vectors):
+            for offset, row_keys in enumerate(self.keys(vectors).tolist()):
+                for table, key in zip(self.buckets, row_keys):
+                    table.setdefault(key, []).append(self.size + offset)
+            self.size += len(vectors)
+        return self
+
+    def candidates(self, vectors: np.ndarray) -> List[np.ndarray]:
+        """Indexed rows sharing a bucket with each vector in any table."""
+        out = []
+        for row_keys in self.keys(vectors).tolist():
+            hits = [row for table, key in zip(self.buckets, row_keys) for row in table.get(key, ())]
+            out.append(np.unique(np.asarray(hits, dtype=np.int64)))
+        return out
+
+    def bucket_groups(self) -> Iterable[np.ndarray]:
+        for table in self.buckets:
+            for rows in table.values():
+                if len(rows) > 1:
+                    yield np.asarray(rows, dtype=np.int64)
+
+
+_lsh: Optional[LSHIndex] = None
+_lsh_version: Optional[int] = None
+
+
+def get_lsh_index(catalog: Catalog) -> LSHIndex:
+    """LSH index over a catalog snapshot, rebuilt when the catalog version changes."""
+    global _lsh, _lsh_version
+    if _lsh is None or _lsh_version != catalog.version:
+        _lsh = LSHIndex(catalog.matrix.shape[1]).add(catalog.matrix)
+        _lsh_version = catalog.version
+    return _lsh
+
+
+class DuplicateFinder:
+    """
+    Near-duplicate check for jobs about to be written, against a catalog snapshot
+    and every job this finder has passed as original since (including earlier rows
+    of the same batch). A pair counts when both the embeddings (cosine) and the text
+    (shingle Jaccard) are close, so a shared template alone is not a match.
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        self.lsh = get_lsh_index(catalog) if len(catalog) else None
+        self.recent: Optional[LSHIndex] = None
+        self.recent_ids: List[str] = []
+        self.recent_vectors: List[np.ndarray] = []
+        self.recent_shingles: List[Set[int]] = []
+
+    async def _catalog_pairs(self, db, docs: List[dict], vectors: np.ndarray, doc_shingles: List[Set[int]]) -> Dict[int, str]:
+        """doc index -> best matching catalog job id"""
+        if self.lsh is None or self.catalog.matrix.shape[1] != vectors.shape[1]:
+            return {}
+        pairs = []
+        for i, rows in enumerate(self.lsh.candidates(vectors)):
+            if not len(rows):
+                continue
+            sims = self.catalog.matrix[rows] @ vectors[i]
+            close = sims >= DEDUP_SIMILARITY
+            pairs += [(float(sim), i, self.catalog.ids[row]) for row, sim in zip(rows[close], sims[close])
+                      if self.catalog.ids[row] != docs[i]["id"]]
+        if not pairs:
+            return {}
+        texts = {}
+        async for job in db.jobs.find({"id": {"$in": sorted({p[2] for p in pairs})}}, DEDUP_TEXT_PROJECTION):
+            texts[job["id"]] = shingles(job)
+        found: Dict[int, str] = {}
+        for _, i, job_id in sorted(pairs, reverse=True):
+            if i not in found and job_id in texts and jaccard(doc_shingles[i], texts[job_id]) >= DEDUP_SHINGLE_JACCARD:
+                found[i] = job_id
+        return found
+
+    def _recent_match(self, vector: np.ndarray, doc_shingles: Set[int], doc_id: str) -> Optional[str]:
+        rows = self.recent.candidates(vector[None, :])[0]
+        if not len(rows):
+            return None
+        sims = np.stack([self.recent_vectors[r] for r in rows]) @ vector
+        order = np.argsort(-sims)
+        for r, sim in zip(rows[order], sims[order]):
+            if sim < DEDUP_SIMILARITY:
+                break
+            if self.recent_ids[r] != doc_id and jaccard(doc_shingles, self.recent_shingles[r]) >= DEDUP_SHINGLE_JACCARD:
+                return self.recent_ids[r]
+        return None
+
+    async def find(self, db, docs: List[dict]) -> Dict[str, str]:
+        """
+        Map the id of every near-duplicate in `docs` (embedded jobs) to the id of the
+        job it duplicates. Docs judged original are remembered for later calls.
+        """
+        docs = [doc for doc in docs if doc.get("embedding") is not None and len(doc["embedding"])]
+        if DEDUP_MODE == "off" or not docs:
+            return {}
+        vectors = _normalize([doc["embedding"] for doc in docs])
+        doc_shingles = [shingles(doc) for doc in docs]
+        found = await self._catalog_pairs(db, docs, vectors, doc_shingles)
+        if self.recent is None:
+            self.recent = LSHIndex(vectors.shape[1])
+
+        duplicates: Dict[str, str] = {}
+        for i, doc in enumerate(docs):
+            # Earlier batches first, then earlier docs of this batch (via the same index)
+            original = found.get(i) or self._recent_match(vectors[i], doc_shingles[i], doc["id"])
+            if original:
+                duplicates[doc["id"]] = original
+                continue
+            self.recent.add(vectors[i][None, :])
+            self.recent_ids.append(doc["id"])
+            self.recent_vectors.append(vectors[i])
+            self.recent_shingles.append(doc_shingles[i])
+        return duplicates
+
+
+_finder: Optional[DuplicateFinder] = None
+
+
+async def get_duplicate_finder(db) -> DuplicateFinder:
+    """
+    Shared finder over the resident catalog. It also remembers every original written
+    since that catalog was loaded, so a stale catalog does not let reposts through.
+    """
+    global _finder
+    catalog = await get_resident_catalog(db)
+    if _finder is None or _finder.catalog is not catalog:
+        _finder = DuplicateFinder(catalog)
+    return _finder
+
+
+async def find_duplicates(db, docs: List[dict]) -> Dict[str, str]:
+    return await (await get_duplicate_finder(db)).find(db, docs)
+
+
+async def merge_duplicates(db, duplicates: Dict[str, str]):
+    """Record merged-away ids as aliases of the job they duplicate."""
+    if not duplicates:
+        return
+    by_original: Dict[str, List[str]] = {}
+    for dup, original in duplicates.items():
+        by_original.setdefault(original, []).append(dup)
+    await db.jobs.bulk_write(
+        [UpdateOne({"id": original}, {"$addToSet": {"aliases": {"$each": dups}}}) for original, dups in by_original.items()],
+        ordered=False,
+    )
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, x: int) -> int:
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        self.parent[self.find(a)] = self.find(b)
+
+
+async def sweep_duplicates(db, mode: Optional[str] = None, apply: bool = False) -> dict:
+    """
+    Find near-duplicate clusters across the whole catalog with the LSH buckets and
+    keep the earliest-posted job of each. With apply=True the others are flagged or
+    merged (per `mode`) and dropped from the catalog, search indexes and priors.
+    """
+    mode = mode or DEDUP_MODE
+    catalog = await get_catalog(db)
+    if len(catalog) < 2:
+        return {"jobs": len(catalog), "clusters": [], "duplicates": 0, "applied": False}
+    lsh = get_lsh_index(catalog)
+
+    close: Set[Tuple[int, int]] = set()
+    for rows in lsh.bucket_groups():
+        sims = catalog.matrix[rows] @ catalog.matrix[rows].T
+        a, b = np.nonzero(np.triu(sims >= DEDUP_SIMILARITY, k=1))
+        close.update(zip(rows[a].tolist(), rows[b].tolist()))
+
+    involved = sorted({catalog.ids[r] for pair in close for r in pair})
+    texts: Dict[str, dict] = {}
+    for start in range(0, len(involved), 1000):
+        chunk = involved[start:start + 1000]
+        async for job in db.jobs.find({"id": {"$in": chunk}}, DEDUP_TEXT_PROJECTION):
+            texts[job["id"]] = job
+    cache: Dict[str, Set[int]] = {job_id: shingles(job) for job_id, job in texts.items()}
+
+    groups = _UnionFind()
+    for a, b in close:
+        ida, idb = catalog.ids[a], catalog.ids[b]
+        if ida in cache and idb in cache and jaccard(cache[ida], cache[idb]) >= DEDUP_SHINGLE_JACCARD:
+            groups.union(a, b)
+    clusters: Dict[int, List[str]] = {}
+    for row in list(groups.parent):
+        clusters.setdefault(groups.find(row), []).append(catalog.ids[row])
+
+    report, duplicates = [], {}
+    for members in clusters.values():
+        members.sort(key=lambda job_id: (str(texts[job_id].get("postedAt") or ""), job_id))
+        original, dups = members[0], members[1:]
+        report.append({"original": original, "duplicates": dups})
+        duplicates.update({dup: original for dup in dups})
+
+    if apply and duplicates:
+        if mode == "merge":
+            await merge_duplicates(db, duplicates)
+            await db.jobs.delete_many({"id": {"$in": list(duplicates)}})
+            await db.job_details.delete_many({"id": {"$in": list(duplicates)}})
+            for dup in duplicates:
+                unindex_job(dup)
+        else:
+            await db.jobs.bulk_write(
+                [UpdateOne({"id": dup}, {"$set": {"duplicateOf": original}}) for dup, original in duplicates.items()],
+                ordered=False,
+            )
+        await invalidate_catalog(db)
+        await del_priors_for_all_users(db, list(duplicates))
+    return {
+        "jobs": len(catalog),
+        "clusters": report,
+        "duplicates": len(duplicates),
+        "applied": bool(apply and duplicates),
+        "mode": mode,
+    }
@@ -1,106 +1,143 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException
-from typing import List, Dict, Any
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Any
+
+# One document per application in the `history` collection:
+# {email, job_id, applied_at}, unique on (email, job_id), read newest first
+HISTORY_ORDER = [("applied_at", DESCENDING), ("job_id", DESCENDING)]
+HISTORY_JOB_PROJECTION = {"_id": 0, "embedding": 0, "raw": 0}
+MIGRATION_BATCH_SIZE = 500
+
+async def _job_exists(db, job_id: str) -> bool:
+    return await db.jobs.count_documents({"id": job_id}, limit=1) > 0
+
+async def _user_exists(db, user_email: str) -> bool:
+    return await db.users.count_documents({"email": user_email}, limit=1) > 0
+
+async def count_history(db, user_email: str) -> int:
+    return await db.history.count_documents({"email": user_email})
+
+def encode_history_cursor(entry: dict) -> str:
+    payload = {"at": entry["applied_at"].isoformat(), "id": entry["job_id"]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(payload["at"]), str(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 async def add_job_to_history(db, user_email: str, job_id: str) -> Dict[str, Any]:
     """Add a job ID to user's history"""
     try:
-        # Check if user exists
-        user = await db.users.find_one({"email": user_email})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Check if job exists
-        job = await db.jobs.find_one({"id": job_id})
-        if not job:
+        if not await _job_exists(db, job_id):
             raise HTTPException(status_code=404, detail="Job not found")
-        
-        # Check if job is already in history
-        current_history = user.get("history", [])
-        if job_id in current_history:
+        if not await _user_exists(db, user_email):
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # The unique (email, job_id) index turns a repeat add into a 409
+        try:
+            await db.history.insert_one(
+                {"email": user_email, "job_id": job_id, "applied_at": datetime.now(timezone.utc)}
+            )
+        except DuplicateKeyError:
             raise HTTPException(status_code=409, detail="Job already in history")
-        
-        # Add job to history
-        updated_history = current_history + [job_id]
-        
-        result = await db.users.update_one(
-            {"email": user_email},
-            {"$set": {"history": updated_history}}
-        )
-        
-        if result.modified_count == 0:
-            raise HTTPException(status_code=500, detail="Failed to update history")
-        
+
         return {
             "message": "Job added to history successfully",
             "job_id": job_id,
-            "history_count": len(updated_history)
+            "history_count": await count_history(db, user_email)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to add job to history: {str(e)}")
 
-async def get_user_history_with_jobs(db, user_email: str) -> List[Dict[str, Any]]:
-    """Get user's history with full job details"""
+async def get_user_history_ids(db, user_email: str) -> List[str]:
+    """Just the job ids in the user's history, newest first, without joining the jobs"""
+    cursor = db.history.find({"email": user_email}, {"_id": 0, "job_id": 1}).sort(HISTORY_ORDER)
+    return [entry["job_id"] async for entry in cursor]
+
+async def applied_job_ids(db, user_email: str, job_ids: Iterable[str]) -> Set[str]:
+    """Which of `job_ids` the user has already applied to"""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return set()
+    cursor = db.history.find({"email": user_email, "job_id": {"$in": job_ids}}, {"_id": 0, "job_id": 1})
+    return {entry["job_id"] async for entry in cursor}
+
+async def applied_job_ids_by_user(db, emails: List[str]) -> Dict[str, Set[str]]:
+    """Every applied job id for each of `emails`, in one query"""
+    applied: Dict[str, Set[str]] = {email: set() for email in emails}
+    async for entry in db.history.find({"email": {"$in": emails}}, {"_id": 0, "email": 1, "job_id": 1}):
+        applied[entry["email"]].add(entry["job_id"])
+    return applied
+
+async def get_user_history_with_jobs(
+    db, user_email: str, limit: int = 50, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+    """
+    One page of the user's history with job details, newest application first,
+    the total history length, and the cursor of the next page (None on the last).
+    """
     try:
-        # Get user
-        user = await db.users.find_one({"email": user_email})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        history_ids = user.get("history", [])
-        if not history_ids:
-            return []
-        
-        # Get all jobs from history
-        jobs_cursor = db.jobs.find({"id": {"$in": history_ids}})
-        jobs = await jobs_cursor.to_list(length=None)
-        
-        # Create a mapping of job_id to job for maintaining order
-        job_map = {job["id"]: job for job in jobs}
-        
-        # Return jobs in the same order as history (most recent first if that's the order)
-        history_jobs = []
-        for job_id in history_ids:
-            if job_id in job_map:
-                job = job_map[job_id]
-                # Remove MongoDB _id and embedding for cleaner response
-                job.pop("_id", None)
-                job.pop("embedding", None)
-                history_jobs.append(job)
-        
-        return history_jobs
-        
+        query: Dict[str, Any] = {"email": user_email}
+        if cursor:
+            applied_at, job_id = decode_history_cursor(cursor)
+            query["$or"] = [
+                {"applied_at": {"$lt": applied_at}},
+                {"applied_at": applied_at, "job_id": {"$lt": job_id}},
+            ]
+        # One extra entry tells whether another page follows
+        entries = await db.history.find(query, {"_id": 0}).sort(HISTORY_ORDER).limit(limit + 1).to_list(length=limit + 1)
+        next_cursor = encode_history_cursor(entries[limit - 1]) if len(entries) > limit else None
+        entries = entries[:limit]
+        total = await count_history(db, user_email)
+        if not entries:
+            return [], total, None
+
+        history_ids = [entry["job_id"] for entry in entries]
+        jobs_cursor = db.jobs.find({"id": {"$in": history_ids}}, HISTORY_JOB_PROJECTION)
+        job_map = {job["id"]: job async for job in jobs_cursor}
+
+        # Expired postings have moved to the archive but stay in history
+        missing = [job_id for job_id in history_ids if job_id not in job_map]
+        if missing:
+            async for job in db.jobs_archive.find({"id": {"$in": missing}}, HISTORY_JOB_PROJECTION):
+                job_map[job["id"]] = job
+
+        # Keep the history order within the page
+        jobs = [
+            {**job_map[entry["job_id"]], "appliedAt": entry["applied_at"].isoformat()}
+            for entry in entries
+            if entry["job_id"] in job_map
+        ]
+        return jobs, total, next_cursor
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get history: {str(e)}")
 
 async def remove_job_from_history(db, user_email: str, job_id: str) -> Dict[str, Any]:
     """Remove a job ID from user's history"""
     try:
-        # Check if user exists
-        user = await db.users.find_one({"email": user_email})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        current_history = user.get("history", [])
-        if job_id not in current_history:
+        result = await db.history.delete_one({"email": user_email, "job_id": job_id})
+        if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Job not found in history")
-        
-        # Remove job from history
-        updated_history = [jid for jid in current_history if jid != job_id]
-        
-        result = await db.users.update_one(
-            {"email": user_email},
-            {"$set": {"history": updated_history}}
-        )
-        
-        if result.modified_count == 0:
-            raise HTTPException(status_code=500, detail="Failed to update history")
-        
+
         return {
             "message": "Job removed from history successfully",
             "job_id": job_id,
-            "history_count": len(updated_history)
+            "history_count": await count_history(db, user_email)
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -109,25 +146,45 @@ async def remove_job_from_history(db, user_email: str, job_id: str) -> Dict[str,
 async def clear_user_history(db, user_email: str) -> Dict[str, Any]:
     """Clear all jobs from user's history"""
     try:
-        # Check if user exists
-        user = await db.users.find_one({"email": user_email})
-        if not user:
+        if not await _user_exists(db, user_email):
             raise HTTPException(status_code=404, detail="User not found")
-        
-        result = await db.users.update_one(
-            {"email": user_email},
-            {"$set": {"history": []}}
-        )
-        
-        if result.modified_count == 0:
-            raise HTTPException(status_code=500, detail="Failed to clear history")
-        
+        await db.history.delete_many({"email": user_email})
+
         return {
             "message": "History cleared successfully",
             "history_count": 0
         }
-        
+
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to clear history: {str(e)}")
+
+async def migrate_history_arrays(db, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Move the legacy `history` arrays off user documents into the history collection.
+    The arrays carry no timestamps, so entries get synthetic applied_at values one
+    millisecond apart that keep the array order. Entries are upserted before the
+    array is unset, so an interrupted run simply resumes next time.
+    """
+    migrated = 0
+    while True:
+        users = await db.users.find(
+            {"history": {"$exists": True}}, {"_id": 0, "email": 1, "history": 1}
+        ).limit(batch_size).to_list(length=batch_size)
+        if not users:
+            return migrated
+        now = datetime.now(timezone.utc)
+        writes = [
+            UpdateOne(
+                {"email": user["email"], "job_id": job_id},
+                {"$setOnInsert": {"applied_at": now - timedelta(milliseconds=len(user["history"]) - i), "migrated": True}},
+                upsert=True,
+            )
+            for user in users
+            for i, job_id in enumerate(dict.fromkeys(user.get("history") or []))
+        ]
+        if writes:
+            await db.history.bulk_write(writes, ordered=False)
+        await db.users.update_many({"email": {"$in": [user["email"] for user in users]}}, {"$unset": {"history": ""}})
+        migrated += len(users)
@@ -1,10 +1,49 @@
 from fastapi import HTTPException
-from server.services.recommendation_service import del_prior_for_all_users, set_prior_for_all_users
-from server.models.job import Job
-from server.model import get_embedding, job_to_text
+from server.services.recommendation_service import del_prior_for_all_users, set_prior_for_all_users, set_priors_for_all_users
+from server.services.user_state_service import get_user_state
+from server.services.archive_service import posted_at
+from server.services.dedup_service import DEDUP_MODE, find_duplicates, merge_duplicates
+from server.services.catalog_service import get_catalog, has_filters, invalidate_catalog
+from server.services.search_service import get_search_index, get_text_index, index_job, unindex_job
+from server.models.job import Job, JobFilters, JobSummary, job_document
+from server.model import get_embedding, get_query_embedding, job_to_text
+from pydantic import ValidationError
+from pymongo import ReplaceOne, UpdateOne
 import numpy as np
-from typing import List, Optional
-import re
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import base64
+import json
+import orjson
+import os
+import time
+
+DEFAULT_PAGE_SIZE = int(os.environ.get("JOBS_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.environ.get("JOBS_MAX_PAGE_SIZE", "200"))
+LISTING_FIELDS = [f for f in JobSummary.__fields__ if f != "id"]
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+# Cold fields live in the job_details collection; jobs keeps a slim hot document
+DESCRIPTION_PREVIEW_CHARS = int(os.environ.get("JOB_DESCRIPTION_PREVIEW_CHARS", "500"))
+HOT_PROJECTION = {"_id": 0, "raw": 0}
+MIGRATION_BATCH_SIZE = 500
+# Stored fields that are not part of Job and must survive an edit (dedup links,
+# and the posting date the expiry window is measured from)
+PRESERVED_ON_EDIT = ("aliases", "duplicateOf", "posted", "postedAt")
+
+BULK_BATCH_SIZE = int(os.environ.get("JOBS_BULK_BATCH_SIZE", "256"))
+MAX_REPORTED_ERRORS = 1000
+# A longer NDJSON line is reported as a row error instead of being buffered
+MAX_BULK_LINE_BYTES = int(os.environ.get("JOBS_BULK_MAX_LINE_BYTES", str(1 << 20)))
+
+# Hybrid search: candidates taken from each retriever and fusion weights. Once
+# retrieval and fusion have taken HYBRID_LATENCY_BUDGET_MS, personalization is
+# skipped; the budget does not cut the earlier stages short.
+HYBRID_CANDIDATES = int(os.environ.get("HYBRID_CANDIDATES", "200"))
+HYBRID_LATENCY_BUDGET_MS = float(os.environ.get("HYBRID_LATENCY_BUDGET_MS", "150"))
+SEMANTIC_WEIGHT = 0.6
+KEYWORD_WEIGHT = 0.4
+PERSONAL_WEIGHT = 0.2
 
 async def get_all_jobs(db):
     jobs = []
@@ -14,18 +53,202 @@ async def get_all_jobs(db):
         jobs.append(Job(**job))
     return jobs
 
+def encode_cursor(last_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return str(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def listing_projection(fields: Optional[List[str]]) -> dict:
+    """Mongo projection for the listing view; unknown fields are rejected"""
+    fields = fields or LISTING_FIELDS
+    unknown = [f for f in fields if f not in LISTING_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return {"_id": 0, "id": 1, **{f: 1 for f in fields}}
+
+async def get_jobs_page(
+    db, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, fields: Optional[List[str]] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of jobs ordered by id (keyset pagination), plus the cursor of the
+    next page or None on the last page. Documents are returned as projected.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = jobs_page_query(cursor)
+    # Fetch one extra row to learn whether another page exists
+    docs = await db.jobs.find(query, listing_projection(fields)).sort("id", 1).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1]["id"]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+def jobs_page_query(cursor: Optional[str]) -> dict:
+    return {"id": {"$gt": decode_cursor(cursor)}} if cursor else {}
+
+async def iter_jobs_ndjson(db, query: dict, projection: Optional[dict] = None) -> AsyncIterator[bytes]:
+    """
+    Stream matching jobs as NDJSON straight from the Mongo cursor, STREAM_BATCH_SIZE
+    lines per chunk, so memory stays constant whatever the result size. Build the
+    projection (listing_projection) before streaming: errors here can no longer
+    become a status code once the response has started.
+    """
+    cursor = db.jobs.find(query, projection or listing_projection(None)).sort("id", 1).batch_size(STREAM_BATCH_SIZE)
+    lines = []
+    async for job in cursor:
+        lines.append(orjson.dumps(job))
+        if len(lines) >= STREAM_BATCH_SIZE:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
 async def create_embedding(db) -> dict:
     jobs = await get_all_jobs(db)
     for job in jobs:
         if not job.embedding:
             job["embedding"] = get_embedding(job_to_text(Job(**job))).tolist()
             await db.jobs.update_one({"id": job.id}, {"$set": {"embedding": job["embedding"]}})
+    await invalidate_catalog(db)
     return {"msg": "Job embeddings created"}
 
+async def suggest_jobs(db, prefix: str, limit: int = 10) -> List[dict]:
+    index = await get_search_index(db)
+    return index.suggest(prefix, limit)
+
+async def search_jobs(db, q: str, limit: int = 20, offset: int = 0) -> Tuple[List[dict], int]:
+    """BM25-ranked page of jobs matching `q` in title, company or description, plus the hit count"""
+    index = await get_text_index(db)
+    ranked, total = index.search(q, limit, offset)
+    ids = [job_id for job_id, _ in ranked]
+    docs = await db.jobs.find({"id": {"$in": ids}}, listing_projection(None)).to_list(length=len(ids))
+    job_map = {doc["id"]: doc for doc in docs}
+    return [{**job_map[job_id], "score": score} for job_id, score in ranked if job_id in job_map], total
+
+def _min_max(x: np.ndarray) -> np.ndarray:
+    lo, hi = float(x.min()), float(x.max())
+    return (x - lo) / (hi - lo) if hi > lo else np.zeros_like(x)
+
+async def hybrid_search_jobs(
+    db, q: str, limit: int = 20, offset: int = 0, user_email: Optional[str] = None
+) -> Tuple[List[dict], int, Dict[str, float]]:
+    """
+    Fuse semantic (query embedding vs catalog matrix) and BM25 scores, optionally
+    boosted by the user's prior. Returns one page of hits, the candidate count and
+    per-stage timings in ms. Personalization is skipped when the stages before it
+    already took HYBRID_LATENCY_BUDGET_MS.
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    def lap(stage):
+        timings[stage] = (time.perf_counter() - start) * 1000 - sum(timings.values())
+
+    # The encode is CPU-bound (on a cache miss); keep it off the event loop
+    query_vec = await asyncio.to_thread(get_query_embedding, q)
+    lap("embed")
+
+    catalog = await get_catalog(db)
+    text_index = await get_text_index(db)
+    rows, top_scores = catalog.top_k(query_vec, HYBRID_CANDIDATES)
+    candidates = [catalog.ids[r] for r in rows]
+    semantic = dict(zip(candidates, top_scores.tolist()))
+    # One BM25 pass feeds both the keyword candidates and their fused scores
+    keyword_scores = text_index.score_all(q)
+    keyword_hits, _ = text_index.rank(keyword_scores, HYBRID_CANDIDATES)
+    extra = [job_id for job_id, _ in keyword_hits if job_id not in semantic]
+    candidates += extra
+    lap("retrieve")
+    if not candidates:
+        return [], 0, timings
+
+    # Keyword-only candidates still need their exact semantic score
+    extra_rows = [catalog.row_of[job_id] for job_id in extra if job_id in catalog.row_of]
+    if extra_rows:
+        semantic.update(zip((catalog.ids[r] for r in extra_rows), catalog.scores(query_vec, np.asarray(extra_rows)).tolist()))
+    sem = np.array([semantic.get(job_id, -1.0) for job_id in candidates], dtype=np.float32)
+    kw = text_index.select(keyword_scores, candidates)
+    fused = SEMANTIC_WEIGHT * _min_max(sem) + KEYWORD_WEIGHT * _min_max(kw)
+    lap("fuse")
+
+    if user_email and sum(timings.values()) < HYBRID_LATENCY_BUDGET_MS:
+        user = await get_user_state(db, user_email, ("prior",))
+        prior = (user or {}).get("prior") or {}
+        if prior:
+            personal = np.array([prior.get(job_id, 0.0) for job_id in candidates], dtype=np.float32)
+            fused += PERSONAL_WEIGHT * _min_max(personal)
+        lap("personalize")
+
+    order = np.argsort(-fused, kind="stable")[offset:offset + limit]
+    page = [candidates[i] for i in order]
+    docs = await db.jobs.find({"id": {"$in": page}}, listing_projection(None)).to_list(length=len(page))
+    job_map = {doc["id"]: doc for doc in docs}
+    hits = [{**job_map[candidates[i]], "score": float(fused[i])} for i in order if candidates[i] in job_map]
+    lap("fetch")
+    return hits, len(candidates), timings
+
+def split_job_document(doc: dict) -> Tuple[dict, dict]:
+    """
+    Split a job into the hot document kept in `jobs` (description cut to a preview,
+    no raw CSV row) and the cold one kept in `job_details`. New jobs without a
+    `posted` date start their active window now; edits keep the stored one.
+    """
+    hot = {k: v for k, v in doc.items() if k not in ("_id", "raw")}
+    hot["postedAt"] = posted_at(doc)
+    description = doc.get("description") or ""
+    hot["description"] = description[:DESCRIPTION_PREVIEW_CHARS]
+    hot["descriptionTruncated"] = len(description) > DESCRIPTION_PREVIEW_CHARS
+    hot["detailsOffloaded"] = True
+    cold = {"id": doc["id"], "description": description, "raw": doc.get("raw")}
+    return hot, cold
+
+async def migrate_job_details(db, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Move raw rows and full descriptions of not-yet-migrated jobs into job_details.
+    The cold copy is written before the hot document is slimmed, so an interrupted
+    run loses nothing and simply resumes next time.
+    """
+    migrated = 0
+    query = {"detailsOffloaded": {"$ne": True}}
+    while True:
+        # Walk the _id index from the last batch on instead of rescanning from the start
+        docs = await db.jobs.find(query, {"embedding": 0}).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            return migrated
+        query = {"detailsOffloaded": {"$ne": True}, "_id": {"$gt": docs[-1]["_id"]}}
+        split = [split_job_document(doc) for doc in docs]
+        await db.job_details.bulk_write(
+            [ReplaceOne({"id": cold["id"]}, cold, upsert=True) for _, cold in split], ordered=False
+        )
+        await db.jobs.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": doc["_id"]},
+                    {"$set": {k: hot[k] for k in ("description", "descriptionTruncated", "detailsOffloaded")}, "$unset": {"raw": ""}},
+                )
+                for doc, (hot, _) in zip(docs, split)
+            ],
+            ordered=False,
+        )
+        migrated += len(docs)
+
 async def get_job_by_id(db, job_id: str):
-    job = await db.jobs.find_one({"id": job_id})
+    job = await db.jobs.find_one({"id": job_id}, HOT_PROJECTION)
+    if not job:
+        # Expired postings stay readable, e.g. from a user's history
+        job = await db.jobs_archive.find_one({"id": job_id}, HOT_PROJECTION)
+    if not job:
+        # Merged-away reposts resolve to the job they duplicated
+        job = await db.jobs.find_one({"aliases": job_id}, HOT_PROJECTION)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    if job.get("detailsOffloaded"):
+        # Detail view: bring back the full description and raw row (of the resolved
+        # job: a merged-away alias has no job_details of its own)
+        details = await db.job_details.find_one({"id": job["id"]}, {"_id": 0, "description": 1, "raw": 1})
+        job.update(details or {})
     job["id"] = str(job["id"])
     return Job(**job)
 
@@ -35,49 +258,215 @@ async def create_job(db, job: Job):
     if existing:
         raise HTTPException(status_code=409, detail="Job already exists")
     job.embedding = get_embedding(job_to_text(job)).tolist()
-    await db.jobs.insert_one(job.dict())
-    # Too heavy?
-    await set_prior_for_all_users(db, job.dict())
+    original = (await find_duplicates(db, [job.dict()])).get(job.id)
+    if original and DEDUP_MODE == "merge":
+        # A repost: keep the original and remember this id as one of its aliases
+        await merge_duplicates(db, {job.id: original})
+        return await get_job_by_id(db, original)
+    hot, cold = split_job_document(job.dict())
+    if original:
+        hot["duplicateOf"] = original
+    await db.job_details.replace_one({"id": job.id}, cold, upsert=True)
+    await db.jobs.insert_one(hot)
+    await invalidate_catalog(db)
+    index_job(job.dict())
+    if not original:
+        # Too heavy?
+        await set_prior_for_all_users(db, job.dict())
     return job
 
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_BULK_LINE_BYTES
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    (line number, line) pairs from a stream of byte chunks, skipping blank lines.
+    Lines longer than max_line_bytes are dropped as they stream in and yielded as None.
+    """
+    buffer = b""
+    lineno = 0
+    oversized = False  # dropping the rest of a line that is already too long
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            lineno += 1
+            if oversized or len(line) > max_line_bytes:
+                oversized = False
+                yield lineno, None
+            elif line.strip():
+                yield lineno, line
+        if len(buffer) > max_line_bytes:
+            oversized, buffer = True, b""
+    if oversized:
+        yield lineno + 1, None
+    elif buffer.strip():
+        yield lineno + 1, buffer
+
+def parse_bulk_row(line: bytes) -> dict:
+    """
+    Validate one NDJSON row (the client/make_json.py format) and return the document
+    to store: the validated Job fields plus any extra feed fields (posted, url, ...).
+    """
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("row is not a JSON object")
+    row.pop("_id", None)  # {"$oid": ...}; jobs are keyed by id
+    job = Job(**row)
+    return {**row, **job.dict(exclude={"embedding"})}
+
+async def _write_bulk_batch(db, docs: List[dict]) -> Tuple[int, int, List[dict], int]:
+    """
+    Embed a batch in one encode call and upsert it with one bulk_write. Returns the
+    upserted and matched counts, the docs written as originals and the duplicate count.
+    """
+    # An unordered bulk_write has no defined order, so the last row for an id wins here
+    docs = list({doc["id"]: doc for doc in docs}.values())
+    # The encode is CPU-bound; keep it off the event loop serving requests
+    embeddings = await asyncio.to_thread(get_embedding, [job_to_text(Job(**doc)) for doc in docs])
+    for doc, embedding in zip(docs, embeddings):
+        doc["embedding"] = embedding.tolist()
+    duplicates = await find_duplicates(db, docs)
+    if DEDUP_MODE == "merge":
+        await merge_duplicates(db, duplicates)
+        docs = [doc for doc in docs if doc["id"] not in duplicates]
+    split = [split_job_document(doc) for doc in docs]
+    for hot, _ in split:
+        if hot["id"] in duplicates:
+            hot["duplicateOf"] = duplicates[hot["id"]]
+    upserted = matched = 0
+    if split:
+        await db.job_details.bulk_write(
+            [ReplaceOne({"id": cold["id"]}, cold, upsert=True) for _, cold in split], ordered=False
+        )
+        result = await db.jobs.bulk_write(
+            [
+                UpdateOne(
+                    {"id": hot["id"]},
+                    {"$set": hot, "$unset": {"raw": "", **({} if "duplicateOf" in hot else {"duplicateOf": ""})}},
+                    upsert=True,
+                )
+                for hot, _ in split
+            ],
+            ordered=False,
+        )
+        upserted, matched = result.upserted_count, result.matched_count
+        await invalidate_catalog(db)
+    for doc in docs:
+        index_job(doc)
+    originals = [doc for doc in docs if doc["id"] not in duplicates]
+    return upserted, matched, originals, len(duplicates)
+
+async def bulk_upsert_jobs(db, chunks: AsyncIterator[bytes]) -> dict:
+    """
+    Ingest an NDJSON stream of jobs. Rows are validated as they are parsed, embedded
+    and upserted BULK_BATCH_SIZE at a time, and priors are propagated once at the end.
+    Invalid rows are reported and skipped without aborting the stream; near-duplicates
+    of existing or earlier rows are flagged or merged (JOB_DEDUP_MODE) and counted.
+    """
+    received = inserted = updated = failed = duplicates = 0
+    errors = []
+    batch: List[dict] = []
+    written: List[dict] = []  # just id + embedding, for the single prior pass
+    async for lineno, line in iter_ndjson_lines(chunks):
+        received += 1
+        try:
+            if line is None:
+                raise ValueError(f"line exceeds {MAX_BULK_LINE_BYTES} bytes")
+            batch.append(parse_bulk_row(line))
+        except (ValueError, TypeError, ValidationError) as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": lineno, "error": str(e)})
+            continue
+        if len(batch) >= BULK_BATCH_SIZE:
+            ins, upd, docs, dup = await _write_bulk_batch(db, batch)
+            inserted, updated, duplicates = inserted + ins, updated + upd, duplicates + dup
+            written += [{"id": doc["id"], "embedding": doc["embedding"]} for doc in docs]
+            batch = []
+    if batch:
+        ins, upd, docs, dup = await _write_bulk_batch(db, batch)
+        inserted, updated, duplicates = inserted + ins, updated + upd, duplicates + dup
+        written += [{"id": doc["id"], "embedding": doc["embedding"]} for doc in docs]
+
+    await set_priors_for_all_users(db, written)
+    return {
+        "received": received,
+        "inserted": inserted,
+        "updated": updated,
+        "failed": failed,
+        "duplicates": duplicates,
+        "errors": errors,
+    }
+
 async def update_job(db, job_id: str, job: Job):
-    result = await db.jobs.replace_one({"id": job_id}, job.dict())
+    # Fields the edit form knows nothing about survive the replace
+    existing = await db.jobs.find_one({"id": job_id}, {"_id": 0, **{f: 1 for f in PRESERVED_ON_EDIT}})
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    hot, cold = split_job_document(job.dict())
+    hot.update(existing)
+    result = await db.jobs.replace_one({"id": job_id}, hot)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Job not found")
+    if job.id != job_id:
+        await db.job_details.delete_one({"id": job_id})
+    await db.job_details.replace_one({"id": job.id}, cold, upsert=True)
     # udpate job
     job.embedding = get_embedding(job_to_text(job)).tolist()
     await db.jobs.update_one({"id": job_id}, {"$set": {"embedding": job.embedding}})
-    await set_prior_for_all_users(db, job.dict())
+    await invalidate_catalog(db)
+    unindex_job(job_id)
+    index_job(job.dict())
+    if "duplicateOf" not in hot:
+        await set_prior_for_all_users(db, job.dict())
     return job
 
 async def delete_job(db, job_id: str):
     result = await db.jobs.delete_one({"id": job_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Job not found")
+    await db.job_details.delete_one({"id": job_id})
+    await invalidate_catalog(db)
+    unindex_job(job_id)
     await del_prior_for_all_users(db, job_id)
     return {"msg": "Job deleted"}
 
 
-async def filter_jobs(db, search: Optional[List[str]]):
+async def search_term_ids(db, search: Optional[List[str]]) -> Optional[Set[str]]:
+    """Ids of jobs whose company or title contains any term, or None without terms."""
     # Normalize and sanitize terms
     terms = [t.strip() for t in (search or []) if t and t.strip()]
-    
-    # Build cursor
     if not terms:
-        cursor = db.jobs.find({})
-    else:
-        # Case-insensitive substring match for each term
-        regexes = [{"$regex": re.escape(t), "$options": "i"} for t in terms]
-        # Match in either company OR title
-        query = {
-            "$or": [{"company": r} for r in regexes] + [{"title": r} for r in regexes]
-        }
-        cursor = db.jobs.find(query)
-
-    # Materialize results into Pydantic models
-    jobs = []
-    async for job in cursor:
-        job["id"] = str(job.get("id") or job.get("_id") or "")
-        job.pop("_id", None)
-        jobs.append(Job(**job))
-    return jobs
+        return None
+    # Case-insensitive substring match of any term in company OR title,
+    # answered by the trigram index instead of an unanchored $regex scan
+    index = await get_search_index(db)
+    return index.search(terms)
+
+
+async def build_filter_query(db, search: Optional[List[str]], filters: Optional[JobFilters] = None) -> dict:
+    ids = await search_term_ids(db, search)
+    if has_filters(filters):
+        # Attribute filters are answered by the catalog index, not a collection scan
+        catalog = await get_catalog(db)
+        _, matching = catalog.subset(catalog.rows(filters))
+        ids = set(matching) if ids is None else ids.intersection(matching)
+    return {} if ids is None else {"id": {"$in": sorted(ids)}}
+
+
+async def facet_jobs(db, search: Optional[List[str]], filters: Optional[JobFilters] = None) -> dict:
+    """
+    Counts per location, employment type and salary band for the jobs matching the
+    search terms and filters, computed from the in-memory indexes alone.
+    """
+    ids = await search_term_ids(db, search)
+    catalog = await get_catalog(db)
+    return catalog.facets(filters, None if ids is None else catalog.rows_of(ids))
+
+
+async def filter_jobs(db, search: Optional[List[str]], filters: Optional[JobFilters] = None):
+    # Build cursor
+    cursor = db.jobs.find(await build_filter_query(db, search, filters), HOT_PROJECTION)
+
+    # Documents come from our own collection: shape them without re-validating
+    return [job_document(job) async for job in cursor]
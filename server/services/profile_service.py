@@ -0,0 +1,102 @@
+# services/profile_service.py
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from pymongo import ReturnDocument
+from server.model import get_embedding, get_prior, user_to_text
+from server.services.user_state_service import USER_PROFILE_PROJECTION, set_user_state
+from server.services.logging_service import log_event
+
+# Embedding and prior are computed off the request path. A user document's
+# profile_state is pending (or processing) until then and is unset once the state
+# is ready, so the sparse index on it only ever holds the backlog.
+PROFILE_PENDING = "pending"
+PROFILE_PROCESSING = "processing"
+PROFILE_READY = "ready"
+PROFILE_WORKER_INTERVAL = float(os.environ.get("PROFILE_WORKER_INTERVAL", "5"))
+# A claim older than this is assumed to belong to a crashed worker and is retried
+PROFILE_CLAIM_TIMEOUT = float(os.environ.get("PROFILE_CLAIM_TIMEOUT", "300"))
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def notify_profile_worker():
+    """Wake the worker now instead of at its next poll."""
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _claim(db, query: dict) -> Optional[dict]:
+    now = datetime.now(timezone.utc)
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)  # as Mongo stores it
+    claimable = {"$or": [
+        {"profile_state": PROFILE_PENDING},
+        {"profile_state": PROFILE_PROCESSING, "profileClaimedAt": {"$lt": now - timedelta(seconds=PROFILE_CLAIM_TIMEOUT)}},
+    ]}
+    user = await db.users.find_one_and_update(
+        {**query, **claimable},
+        {"$set": {"profile_state": PROFILE_PROCESSING, "profileClaimedAt": now}},
+        projection=USER_PROFILE_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if user is not None:
+        user["profileClaimedAt"] = now
+    return user
+
+
+async def _build_state(db, user: dict) -> dict:
+    started = time.perf_counter()
+    # The encode is CPU-bound; keep it off the event loop serving requests
+    embedding = (await asyncio.to_thread(get_embedding, user_to_text(user))).tolist()
+    prior = await get_prior(db, embedding) or {}
+    await set_user_state(db, user["email"], embedding=embedding, prior=prior)
+    # A profile edit during the build set it back to pending: leave it for the next pass
+    await db.users.update_one(
+        {"email": user["email"], "profile_state": PROFILE_PROCESSING, "profileClaimedAt": user["profileClaimedAt"]},
+        {"$unset": {"profile_state": "", "profileClaimedAt": ""}},
+    )
+    log_event("profile_state_ready", {
+        "email": user["email"],
+        "prior_size": len(prior),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+    return {"email": user["email"], "embedding": embedding, "prior": prior}
+
+
+async def process_next_pending(db) -> bool:
+    """Build the state of one pending user; False when none is waiting."""
+    user = await _claim(db, {})
+    if user is None:
+        return False
+    await _build_state(db, user)
+    return True
+
+
+async def build_user_state_now(db, email: str) -> Optional[dict]:
+    """
+    Build a pending user's state inline, for requests that cannot do without it.
+    Returns None when the user is not pending (or another worker holds the claim).
+    """
+    user = await _claim(db, {"email": email})
+    if user is None:
+        return None
+    return await _build_state(db, user)
+
+
+async def run_profile_worker(db, interval: float = PROFILE_WORKER_INTERVAL):
+    """Build pending users' embeddings and priors until cancelled."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    while True:
+        _wakeup.clear()
+        try:
+            while await process_next_pending(db):
+                pass
+        except Exception as e:
+            log_event("profile_worker_failed", {"error": str(e)})
+        try:
+            await asyncio.wait_for(_wakeup.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
@@ -1,62 +1,215 @@
-from typing import List
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, Optional
 from server.model import cosine_sim
-from server.models.job import Job
+from server.models.job import Job, JobFilters, job_document
+from server.services.catalog_service import get_catalog
+from server.services.history_service import applied_job_ids, applied_job_ids_by_user
 from server.models.user import User
 import numpy as np
 
+# Users whose embedding/prior is still being built get popular recent jobs:
+# the most applied-to in the last COLD_START_WINDOW_DAYS, then the newest postings
+COLD_START_TTL = float(os.environ.get("COLD_START_TTL", "300"))
+COLD_START_WINDOW_DAYS = float(os.environ.get("COLD_START_WINDOW_DAYS", "14"))
+COLD_START_POOL = 200
+_cold_start: Dict[str, object] = {"ids": [], "expires": 0.0}
+
 async def set_prior_for_all_users(db, job):
     """
     Set prior probabilities for all users based on a new job posting.
     """
+    await set_priors_for_all_users(db, [job])
+
+async def set_priors_for_all_users(db, jobs: List[dict]):
+    """
+    Set prior probabilities for all users for a batch of new or changed jobs,
+    visiting every user once regardless of the batch size.
+    """
     factor = 2
-    async for user in db.users.find({}):
+    jobs = [job for job in jobs if job.get("embedding")]
+    if not jobs:
+        return
+    job_matrix = np.array([job["embedding"] for job in jobs], dtype=np.float32)
+    async for user in db.user_state.find({}, {"email": 1, "embedding": 1, "prior": 1}):
         # Example logic: Assign a uniform prior probability for the new job to all users
         if "prior" not in user or not isinstance(user["prior"], dict):
             user["prior"] = {}
 
-        if "embedding" in user and "embedding" in job:
-            # Calculate similarity-based probability
-            similarity_prob = (1 + cosine_sim(user["embedding"], np.array([job["embedding"]]))) / 2
-            similarity_prob = factor * float(similarity_prob[0])
+        if "embedding" in user:
+            # Calculate similarity-based probability for the whole batch at once
+            similarity_probs = factor * (1 + cosine_sim(user["embedding"], job_matrix)) / 2
 
             # Get existing prior values to determine appropriate priority
             existing_values = list(user["prior"].values()) if user["prior"] else [0.0]
+            min_prior = min(existing_values)
+            max_prior = max(existing_values)
 
-            if existing_values:
-                min_prior = min(existing_values)
-                max_prior = max(existing_values)
-
+            for job, similarity_prob in zip(jobs, similarity_probs):
                 # Scale similarity_prob to fit within the range of existing probabilities
-                scaled_similarity = min_prior + (similarity_prob * (max_prior - min_prior))
-
-                # Ensure the scaled similarity does not dominate existing probabilities
-                target_priority = scaled_similarity
-            else:
-                target_priority = similarity_prob
-
-            user["prior"][job["id"]] = target_priority
-        await db.users.update_one({"email": user["email"]}, {"$set": {"prior": user["prior"]}})
+                # so the new job does not dominate existing probabilities
+                user["prior"][job["id"]] = min_prior + (float(similarity_prob) * (max_prior - min_prior))
+        await db.user_state.update_one({"email": user["email"]}, {"$set": {"prior": user["prior"]}})
 
 async def del_prior_for_all_users(db, job_id):
     """
     Delete prior probabilities for all users for a specific job.
     """
-    async for user in db.users.find({}):
-        if "prior" in user and isinstance(user["prior"], dict):
-            user["prior"].pop(job_id, None)
-        await db.users.update_one({"email": user["email"]}, {"$set": {"prior": user["prior"]}})
+    await del_priors_for_all_users(db, [job_id])
 
-async def get_recommendations_for_user(db, user) -> List[Job]:
+async def del_priors_for_all_users(db, job_ids: List[str]):
+    """
+    Delete prior probabilities for all users for a batch of jobs with a single
+    server-side update instead of rewriting every user's prior.
     """
-    Return the top 5 jobs sorted by prior probability for the user.
+    # Ids that are not valid field paths have to be removed client-side
+    plain = [job_id for job_id in job_ids if "." not in job_id and not job_id.startswith("$")]
+    if plain:
+        await db.user_state.update_many({"prior": {"$type": "object"}}, {"$unset": {f"prior.{job_id}": "" for job_id in plain}})
+    odd = set(job_ids) - set(plain)
+    if odd:
+        async for user in db.user_state.find({}, {"email": 1, "prior": 1}):
+            if isinstance(user.get("prior"), dict) and odd & user["prior"].keys():
+                prior = {k: v for k, v in user["prior"].items() if k not in odd}
+                await db.user_state.update_one({"email": user["email"]}, {"$set": {"prior": prior}})
+
+async def get_recommendations_for_user(db, user, filters: Optional[JobFilters] = None, k: int = 5) -> List[dict]:
+    """
+    Return the top k jobs sorted by prior probability for the user, given the
+    user's state (email and prior). When filters are given only the matching
+    catalog rows are scored.
     """
     if "prior" not in user or not user["prior"]:
         return []
-    # Fetch all jobs
-    jobs = await db.jobs.find({}).to_list(length=None)
-    # Get top 5 jobs by prior probability for the user
-    top_jobs = sorted(jobs, key=lambda job: user["prior"].get(job["id"], 0), reverse=True)
-    # Filter based on not being in history
-    history = user.get("history", [])
-    top_jobs = [job for job in top_jobs if job["id"] not in history][:5]
-    return [Job(**job) for job in top_jobs]
\ No newline at end of file
+    catalog = await get_catalog(db)
+    _, job_ids = catalog.subset(catalog.rows(filters))
+    if not job_ids:
+        return []
+    prior = user["prior"]
+    scores = np.fromiter((prior.get(job_id, 0.0) for job_id in job_ids), dtype=np.float64, count=len(job_ids))
+    # Check the best rows against the user's history, widening the window
+    # only while applied jobs leave fewer than k
+    n = min(len(job_ids), 2 * k)
+    while True:
+        top = np.argpartition(-scores, n - 1)[:n] if n < len(job_ids) else np.arange(len(job_ids))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        candidates = [job_ids[r] for r in top]
+        applied = await applied_job_ids(db, user["email"], candidates)
+        top_ids = [job_id for job_id in candidates if job_id not in applied][:k]
+        if len(top_ids) == k or n == len(job_ids):
+            break
+        n = min(len(job_ids), n * 4)
+    # Fetch just the winning jobs, keeping the ranking order
+    jobs = await db.jobs.find({"id": {"$in": top_ids}}, {"_id": 0, "raw": 0}).to_list(length=None)
+    job_map = {job["id"]: job for job in jobs}
+    return [job_document(job_map[job_id]) for job_id in top_ids if job_id in job_map]
+
+async def _cold_start_ids(db) -> List[str]:
+    """Ranked cold-start pool, rebuilt at most every COLD_START_TTL seconds."""
+    if time.monotonic() < _cold_start["expires"]:
+        return _cold_start["ids"]
+    since = datetime.now(timezone.utc) - timedelta(days=COLD_START_WINDOW_DAYS)
+    popular = await db.history.aggregate([
+        {"$match": {"applied_at": {"$gte": since}}},
+        {"$group": {"_id": "$job_id", "applications": {"$sum": 1}}},
+        {"$sort": {"applications": -1, "_id": 1}},
+        {"$limit": COLD_START_POOL},
+    ]).to_list(length=COLD_START_POOL)
+    recent = await db.jobs.find({}, {"_id": 0, "id": 1}).sort("postedAt", -1).limit(COLD_START_POOL).to_list(length=COLD_START_POOL)
+    ids = list(dict.fromkeys([entry["_id"] for entry in popular] + [job["id"] for job in recent]))
+    _cold_start.update(ids=ids, expires=time.monotonic() + COLD_START_TTL)
+    return ids
+
+async def get_cold_start_recommendations(db, email: str, filters: Optional[JobFilters] = None, k: int = 5) -> List[dict]:
+    """
+    Popular recent jobs for a user without a prior yet, restricted like the
+    personalized list to live catalog jobs matching the filters and not applied to.
+    """
+    catalog = await get_catalog(db)
+    rows = catalog.rows(filters)
+    allowed = catalog.row_of if rows is None else {catalog.ids[r] for r in rows}
+    candidates = [job_id for job_id in await _cold_start_ids(db) if job_id in allowed]
+    applied = await applied_job_ids(db, email, candidates)
+    top_ids = [job_id for job_id in candidates if job_id not in applied][:k]
+    jobs = await db.jobs.find({"id": {"$in": top_ids}}, {"_id": 0, "raw": 0}).to_list(length=None)
+    job_map = {job["id"]: job for job in jobs}
+    return [job_document(job_map[job_id]) for job_id in top_ids if job_id in job_map]
+
+
+def _top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise indices of the k largest scores, best first. scores: (users, jobs)"""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+async def _score_user_block(db, catalog, users: List[dict], k: int) -> List[Dict]:
+    """Score one block of users against the whole catalog with matrix operations."""
+    n = len(catalog)
+    scores = np.zeros((len(users), n), dtype=np.float32)
+    # Users without a stored prior fall back to the cosine prior, computed as one matmul
+    cold = [i for i, u in enumerate(users) if not u.get("prior") and u.get("embedding")]
+    if cold:
+        emb = np.asarray([users[i]["embedding"] for i in cold], dtype=np.float32)
+        norms = np.linalg.norm(emb, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores[cold] = ((catalog.matrix @ (emb / norms).T).T + 1) / 2
+    # Stored priors are scattered into their rows in one pass; jobs no longer in
+    # the catalog are dropped and missing ones stay 0
+    priors = [(i, u["prior"]) for i, u in enumerate(users) if u.get("prior")]
+    if priors:
+        sizes = [len(prior) for _, prior in priors]
+        total = sum(sizes)
+        user_rows = np.repeat(np.asarray([i for i, _ in priors], dtype=np.int64), sizes)
+        job_rows = np.fromiter((catalog.row_of.get(job_id, -1) for _, prior in priors for job_id in prior), dtype=np.int64, count=total)
+        values = np.fromiter((p for _, prior in priors for p in prior.values()), dtype=np.float32, count=total)
+        known = job_rows >= 0
+        scores[user_rows[known], job_rows[known]] = values[known]
+    applied = await applied_job_ids_by_user(db, [user["email"] for user in users])
+    for i, user in enumerate(users):
+        # Never recommend something the user already applied to
+        for job_id in applied[user["email"]]:
+            row = catalog.row_of.get(job_id)
+            if row is not None:
+                scores[i, row] = -np.inf
+    # Users with neither a prior nor an embedding have nothing to rank by: no recommendations
+    scores[[i for i, u in enumerate(users) if not u.get("prior") and not u.get("embedding")]] = -np.inf
+    top = _top_k_rows(scores, k)
+
+    top_ids = {catalog.ids[r] for i, rows in enumerate(top) for r in rows if np.isfinite(scores[i, r])}
+    jobs = {
+        job["id"]: job
+        async for job in db.jobs.find({"id": {"$in": list(top_ids)}}, {"_id": 0, "id": 1, "title": 1, "company": 1, "location": 1})
+    }
+    results = []
+    for i, user in enumerate(users):
+        recs = [
+            {**jobs[catalog.ids[r]], "score": float(scores[i, r])}
+            for r in top[i]
+            if np.isfinite(scores[i, r]) and catalog.ids[r] in jobs
+        ]
+        results.append({"email": user["email"], "recommendations": recs})
+    return results
+
+async def iter_recommendations_for_users(
+    db, emails: Optional[List[str]] = None, k: int = 10, block_size: int = 256
+) -> AsyncIterator[Dict]:
+    """
+    Yield {"email", "recommendations"} for every user (or just `emails`),
+    scoring users block_size at a time against the resident catalog.
+    """
+    catalog = await get_catalog(db)
+    if not len(catalog):
+        return
+    query = {"email": {"$in": emails}} if emails else {}
+    block = []
+    async for user in db.user_state.find(query, {"_id": 0, "email": 1, "embedding": 1, "prior": 1}):
+        block.append(user)
+        if len(block) == block_size:
+            for result in await _score_user_block(db, catalog, block, k):
+                yield result
+            block = []
+    if block:
+        for result in await _score_user_block(db, catalog, block, k):
+            yield result
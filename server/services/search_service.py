@@ -0,0 +1,382 @@
+# services/search_service.py
+import math
+import os
+import re
+import time
+from array import array
+from collections import Counter
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from server.services.cache_service import SingleFlight
+
+SEARCH_FIELDS = ("company", "title")
+# Term-frequency weight of each field in the full-text index (a cheap BM25F)
+TEXT_FIELD_WEIGHTS = {"title": 3, "company": 2, "description": 1}
+# Rebuild from Mongo after this many seconds so writes made by other pods show up
+SEARCH_INDEX_TTL = float(os.environ.get("SEARCH_INDEX_TTL", "300"))
+
+
+def normalize_text(value) -> str:
+    return str(value or "").casefold()
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SubstringIndex:
+    """
+    Trigram index over the distinct company and title strings of all jobs.
+    Answers case-insensitive substring queries (the old $regex semantics)
+    and typeahead suggestions from the same postings.
+    """
+
+    def __init__(self):
+        self.grams: Dict[str, Set[int]] = {}
+        self.values: Dict[int, Tuple[str, str, str]] = {}  # value id -> (field, normalized, display)
+        self.value_ids: Dict[Tuple[str, str], int] = {}
+        self.jobs_of: Dict[int, Set[str]] = {}  # value id -> job ids
+        self.values_of: Dict[str, List[int]] = {}  # job id -> value ids
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.values_of)
+
+    def _value_id(self, field: str, display: str) -> int:
+        key = (field, normalize_text(display))
+        vid = self.value_ids.get(key)
+        if vid is None:
+            vid = self._next_id
+            self._next_id += 1
+            self.value_ids[key] = vid
+            self.values[vid] = (field, key[1], display)
+            self.jobs_of[vid] = set()
+            for gram in trigrams(key[1]):
+                self.grams.setdefault(gram, set()).add(vid)
+        return vid
+
+    def _drop_value(self, vid: int):
+        field, text, _ = self.values.pop(vid)
+        del self.value_ids[(field, text)]
+        del self.jobs_of[vid]
+        for gram in trigrams(text):
+            postings = self.grams.get(gram)
+            if postings is not None:
+                postings.discard(vid)
+                if not postings:
+                    del self.grams[gram]
+
+    def add(self, job: dict):
+        job_id = str(job["id"])
+        self.remove(job_id)
+        vids = []
+        for field in SEARCH_FIELDS:
+            if job.get(field):
+                vid = self._value_id(field, str(job[field]))
+                self.jobs_of[vid].add(job_id)
+                vids.append(vid)
+        self.values_of[job_id] = vids
+
+    def remove(self, job_id: str):
+        for vid in self.values_of.pop(job_id, []):
+            jobs = self.jobs_of.get(vid)
+            if jobs is None:
+                continue
+            jobs.discard(job_id)
+            if not jobs:
+                self._drop_value(vid)
+
+    def _match_values(self, term: str) -> Iterable[int]:
+        """Ids of the distinct values containing `term` (already normalized)."""
+        if len(term) < 3:
+            # Too short for trigrams: scan the distinct values, still far fewer than jobs
+            return [vid for vid, (_, text, _) in self.values.items() if term in text]
+        postings = sorted((self.grams.get(g, set()) for g in trigrams(term)), key=len)
+        candidates = set.intersection(*postings) if postings else set()
+        return [vid for vid in candidates if term in self.values[vid][1]]
+
+    def search(self, terms: List[str]) -> Set[str]:
+        """Job ids whose company or title contains any of the terms."""
+        job_ids: Set[str] = set()
+        for term in terms:
+            for vid in self._match_values(normalize_text(term)):
+                job_ids |= self.jobs_of[vid]
+        return job_ids
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Company/title completions for `prefix`, best matches first."""
+        term = normalize_text(prefix).strip()
+        if not term:
+            return []
+
+        def rank(vid):
+            _, text, _ = self.values[vid]
+            # Whole-value prefix beats word prefix beats plain substring, then popularity
+            if text.startswith(term):
+                position = 0
+            elif (" " + term) in text:
+                position = 1
+            else:
+                position = 2
+            return (position, -len(self.jobs_of[vid]), len(text))
+
+        best = sorted(self._match_values(term), key=rank)[:limit]
+        return [
+            {"text": self.values[vid][2], "field": self.values[vid][0], "count": len(self.jobs_of[vid])}
+            for vid in best
+        ]
+
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to we will with you your".split()
+)
+
+
+def tokenize(text) -> List[str]:
+    return [t for t in _TOKEN.findall(normalize_text(text)) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index with BM25 ranking over title, company and description.
+    Postings are append-only typed arrays (doc numbers and term frequencies);
+    removed or replaced jobs are tombstoned and dropped on compaction.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []  # doc number -> job id
+        self.doc_num: Dict[str, int] = {}  # job id -> live doc number
+        self.doc_len = array("f")
+        self.alive = bytearray()
+        self.postings: Dict[str, Tuple[array, array]] = {}  # term -> (doc numbers, term frequencies)
+        self.total_len = 0.0
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.doc_num)
+
+    def add(self, job: dict):
+        job_id = str(job["id"])
+        self.remove(job_id)
+        tf = Counter()
+        for field, weight in TEXT_FIELD_WEIGHTS.items():
+            for token in tokenize(job.get(field)):
+                tf[token] += weight
+        doc = len(self.doc_ids)
+        self.doc_ids.append(job_id)
+        self.doc_num[job_id] = doc
+        length = float(sum(tf.values()))
+        self.doc_len.append(length)
+        self.alive.append(1)
+        self.total_len += length
+        for term, freq in tf.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = (array("i"), array("f"))
+            postings[0].append(doc)
+            postings[1].append(freq)
+
+    def remove(self, job_id: str):
+        doc = self.doc_num.pop(job_id, None)
+        if doc is None:
+            return
+        self.alive[doc] = 0
+        self.total_len -= self.doc_len[doc]
+        self.dead += 1
+        # Keep tombstones from dominating the postings
+        if self.dead > 1000 and self.dead > len(self.doc_num):
+            self.compact()
+
+    def compact(self):
+        """Renumber live documents and drop tombstoned postings."""
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        for term, (docs, freqs) in list(self.postings.items()):
+            d = np.frombuffer(docs, dtype=np.int32)
+            keep = alive[d]
+            if not keep.any():
+                del self.postings[term]
+                continue
+            self.postings[term] = (
+                array("i", remap[d[keep]].astype(np.int32).tobytes()),
+                array("f", np.frombuffer(freqs, dtype=np.float32)[keep].tobytes()),
+            )
+        self.doc_ids = [job_id for job_id, live in zip(self.doc_ids, self.alive) if live]
+        self.doc_num = {job_id: i for i, job_id in enumerate(self.doc_ids)}
+        self.doc_len = array("f", np.frombuffer(self.doc_len, dtype=np.float32)[alive].tobytes())
+        self.alive = bytearray(b"\x01" * len(self.doc_ids))
+        self.dead = 0
+
+    def nbytes(self) -> int:
+        """Approximate memory held by postings and per-document arrays."""
+        postings = sum(d.itemsize * len(d) + f.itemsize * len(f) for d, f in self.postings.values())
+        return postings + self.doc_len.itemsize * len(self.doc_len) + len(self.alive)
+
+    def score_all(self, query: str) -> Optional[np.ndarray]:
+        """BM25 score of every doc number for `query` (0 for non-matching), or None."""
+        n = len(self.doc_num)
+        terms = [t for t in set(tokenize(query)) if t in self.postings]
+        if not n or not terms:
+            return None
+        doc_len = np.frombuffer(self.doc_len, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * doc_len / (self.total_len / n))
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term in terms:
+            docs, freqs = self.postings[term]
+            d = np.frombuffer(docs, dtype=np.int32)
+            f = np.frombuffer(freqs, dtype=np.float32)
+            # Tombstoned postings do not count towards the document frequency
+            df = int(np.count_nonzero(alive[d]))
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            scores[d] += idf * f * (self.k1 + 1) / (f + norm[d])
+        scores[~alive] = 0
+        return scores
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[Tuple[str, float]], int]:
+        """Ranked (job id, score) pairs for one page, plus the total number of hits."""
+        return self.rank(self.score_all(query), limit, offset)
+
+    def rank(self, scores: Optional[np.ndarray], limit: int = 20, offset: int = 0) -> Tuple[List[Tuple[str, float]], int]:
+        """search() over scores already computed by score_all()."""
+        if scores is None:
+            return [], 0
+        hits = np.flatnonzero(scores)
+        end = min(offset + limit, len(hits))
+        if offset >= end:
+            return [], len(hits)
+        top = hits[np.argpartition(-scores[hits], end - 1)[:end]] if end < len(hits) else hits
+        top = top[np.argsort(-scores[top], kind="stable")][offset:end]
+        return [(self.doc_ids[doc], float(scores[doc])) for doc in top], len(hits)
+
+    def scores_for(self, query: str, job_ids: List[str]) -> np.ndarray:
+        """BM25 scores of the given jobs (0 for unknown or non-matching jobs)."""
+        return self.select(self.score_all(query), job_ids)
+
+    def select(self, scores: Optional[np.ndarray], job_ids: List[str]) -> np.ndarray:
+        """scores_for() over scores already computed by score_all()."""
+        if scores is None:
+            return np.zeros(len(job_ids), dtype=np.float32)
+        docs = [self.doc_num.get(job_id, -1) for job_id in job_ids]
+        return np.array([scores[d] if d >= 0 else 0.0 for d in docs], dtype=np.float32)
+
+
+_index: Optional[SubstringIndex] = None
+_built_at = 0.0
+_index_builds = SingleFlight("search_index_build")
+# Writes made while an index rebuilds, replayed onto the new index before it is
+# swapped in (the build reads Mongo as it was when its scan got there)
+_pending: Dict[str, Optional[List[Tuple[str, object]]]] = {"substring": None, "text": None}
+
+
+async def _build_with_replay(kind: str, build):
+    """Run build() while recording index writes, then replay them onto the result."""
+    _pending[kind] = []
+    try:
+        index = await build()
+        for op, arg in _pending[kind]:
+            if op == "add":
+                index.add(arg)
+            else:
+                index.remove(arg)
+        return index
+    finally:
+        _pending[kind] = None
+
+
+async def build_search_index(db) -> SubstringIndex:
+    index = SubstringIndex()
+    projection = {"_id": 0, "id": 1, **{f: 1 for f in SEARCH_FIELDS}}
+    async for job in db.jobs.find({}, projection):
+        index.add(job)
+    return index
+
+
+async def get_search_index(db) -> SubstringIndex:
+    """Return the in-process search index, building it on first use or after the TTL."""
+    if _index is None or time.monotonic() - _built_at > SEARCH_INDEX_TTL:
+        await _index_builds.do("substring", lambda: _rebuild_search_index(db))
+    return _index
+
+
+async def _rebuild_search_index(db) -> SubstringIndex:
+    global _index, _built_at
+    index = await _build_with_replay("substring", lambda: build_search_index(db))
+    # Swapped in right after the replay, with no await in between
+    _index, _built_at = index, time.monotonic()
+    return index
+
+
+_text_index: Optional[BM25Index] = None
+_text_built_at = 0.0
+
+
+async def _add_with_full_descriptions(db, index: BM25Index, jobs: List[dict]):
+    """Index a batch of hot documents, swapping preview descriptions for the full text."""
+    truncated = [job["id"] for job in jobs if job.get("descriptionTruncated")]
+    if truncated:
+        full = {
+            d["id"]: d.get("description")
+            async for d in db.job_details.find({"id": {"$in": truncated}}, {"_id": 0, "id": 1, "description": 1})
+        }
+        for job in jobs:
+            if job["id"] in full:
+                job["description"] = full[job["id"]]
+    for job in jobs:
+        index.add(job)
+
+
+async def build_text_index(db, batch_size: int = 500) -> BM25Index:
+    index = BM25Index()
+    projection = {"_id": 0, "id": 1, "descriptionTruncated": 1, **{f: 1 for f in TEXT_FIELD_WEIGHTS}}
+    batch = []
+    async for job in db.jobs.find({}, projection):
+        batch.append(job)
+        if len(batch) >= batch_size:
+            await _add_with_full_descriptions(db, index, batch)
+            batch = []
+    if batch:
+        await _add_with_full_descriptions(db, index, batch)
+    return index
+
+
+async def get_text_index(db) -> BM25Index:
+    """Return the in-process full-text index, building it on first use or after the TTL."""
+    if _text_index is None or time.monotonic() - _text_built_at > SEARCH_INDEX_TTL:
+        await _index_builds.do("text", lambda: _rebuild_text_index(db))
+    return _text_index
+
+
+async def _rebuild_text_index(db) -> BM25Index:
+    global _text_index, _text_built_at
+    index = await _build_with_replay("text", lambda: build_text_index(db))
+    _text_index, _text_built_at = index, time.monotonic()
+    return index
+
+
+def index_job(job: dict):
+    """Keep the built indexes (and any being rebuilt) in sync with a created or updated job."""
+    _record("add", job)
+    if _index is not None:
+        _index.add(job)
+    if _text_index is not None:
+        _text_index.add(job)
+
+
+def unindex_job(job_id: str):
+    _record("remove", job_id)
+    if _index is not None:
+        _index.remove(job_id)
+    if _text_index is not None:
+        _text_index.remove(job_id)
+
+
+def _record(op: str, arg):
+    for pending in _pending.values():
+        if pending is not None:
+            pending.append((op, arg))
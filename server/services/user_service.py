@@ -1,34 +1,35 @@
 # services/user_service.py
 from fastapi import HTTPException
-from server.services.auth_service import get_password_hash, verify_password
+from server.services.auth_service import check_password, hash_password, password_needs_rehash
 from server.models.user import User, UserLogin, UserUpdate
-from server.model import get_embedding, get_prior, user_to_text
-import numpy as np
+from server.services.user_state_service import USER_PROFILE_PROJECTION
+from server.services.profile_service import PROFILE_PENDING, notify_profile_worker
 
 async def create_user(db, user: User):
-    user_in_db = await db.users.find_one({"email": user.email})
-    if user_in_db:
+    if await db.users.count_documents({"email": user.email}, limit=1):
         raise HTTPException(status_code=409, detail="User already exists")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     user_dict = user.dict()
     user_dict["password"] = hashed_password
-    user_dict["embedding"] = get_embedding(user_to_text(user_dict))
-    user_dict["embedding"] = user_dict["embedding"].tolist()
-    user_dict["prior"] = await get_prior(db, user_dict["embedding"]) or {}
-    print("Prior for user", user_dict["prior"])
+    # Embedding and prior are built by the profile worker; signup does not wait for them
+    user_dict["profile_state"] = PROFILE_PENDING
     await db.users.insert_one(user_dict)
+    notify_profile_worker()
     return user_dict
 
 async def authenticate_user(db, user: UserLogin):
-    db_user = await db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    db_user = await db.users.find_one({"email": user.email}, {"_id": 0, "email": 1, "password": 1})
+    if not db_user or not await check_password(user.password, db_user["password"]):
         raise HTTPException(status_code=403, detail="Invalid credentials")
+    # Bring hashes made at an older cost up to BCRYPT_ROUNDS while we have the password
+    if password_needs_rehash(db_user["password"]):
+        await db.users.update_one({"email": user.email}, {"$set": {"password": await hash_password(user.password)}})
     return db_user
 
 async def update_user(db, email: str, user_update: UserUpdate):
     """Update user profile information ---To be made neater"""
     # Check if user exists
-    existing_user = await db.users.find_one({"email": email})
+    existing_user = await db.users.find_one({"email": email}, USER_PROFILE_PROJECTION)
     if not existing_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -40,17 +41,11 @@ async def update_user(db, email: str, user_update: UserUpdate):
         update_data.update(update_dict)
         print("Update data:", update_data)
         
-        # If any profile data is being updated, regenerate embedding
+        # If any profile data is being updated, the profile worker regenerates
+        # the embedding and prior from the stored profile
         profile_fields = ["name", "location", "summary", "skills", "role", "education", "experience"]
         if any(field in update_dict for field in profile_fields):
-            # Create a temporary user object for embedding generation
-            temp_user_data = existing_user.copy()
-            temp_user_data.update(update_data)
-            
-            new_embedding = get_embedding(user_to_text(temp_user_data))
-            update_data["embedding"] = new_embedding.tolist()
-            # get_prior is async; await it before storing into DB
-            update_data["prior"] = await get_prior(db, update_data["embedding"]) or {}
+            update_data["profile_state"] = PROFILE_PENDING
     
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
@@ -63,11 +58,10 @@ async def update_user(db, email: str, user_update: UserUpdate):
     
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="No changes made")
+    if update_data.get("profile_state") == PROFILE_PENDING:
+        notify_profile_worker()
     
     # Return updated user (excluding sensitive fields)
-    updated_user = await db.users.find_one(
-        {"email": email},
-        {"_id": 0, "password": 0, "embedding": 0}
-    )
+    updated_user = await db.users.find_one({"email": email}, USER_PROFILE_PROJECTION)
     
     return updated_user
@@ -0,0 +1,70 @@
+# services/user_state_service.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+
+# The large ML state of a user lives in user_state, keyed by email, so profile
+# reads never ship it. Callers project just the fields they need.
+USER_STATE_FIELDS = ("embedding", "prior")
+# Profile reads never carry the password or legacy ML state
+USER_PROFILE_PROJECTION = {"_id": 0, "password": 0, "embedding": 0, "prior": 0}
+MIGRATION_BATCH_SIZE = 500
+
+def state_projection(fields: Iterable[str]) -> dict:
+    return {"_id": 0, "email": 1, **{field: 1 for field in fields}}
+
+async def get_user_state(db, email: str, fields: Iterable[str] = USER_STATE_FIELDS) -> Optional[dict]:
+    """
+    The requested state fields of one user. Users whose state has not been moved
+    off the profile document yet are read from there.
+    """
+    fields = list(fields)
+    state = await db.user_state.find_one({"email": email}, state_projection(fields))
+    if state is None:
+        state = await db.users.find_one({"email": email, "$or": [{f: {"$exists": True}} for f in fields]}, state_projection(fields))
+    return state
+
+async def set_user_state(db, email: str, **state):
+    await db.user_state.update_one({"email": email}, {"$set": state}, upsert=True)
+
+async def delete_user_state(db, email: str):
+    await db.user_state.delete_one({"email": email})
+
+async def get_prior_page(db, email: str, limit: int, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+    """One page of the user's prior as {job_id, probability} entries, and the prior's size"""
+    pages = await db.user_state.aggregate([
+        {"$match": {"email": email}},
+        {"$project": {"_id": 0, "entries": {"$objectToArray": {"$ifNull": ["$prior", {}]}}}},
+        {"$project": {"total": {"$size": "$entries"}, "page": {"$slice": ["$entries", offset, limit]}}},
+    ]).to_list(length=1)
+    if not pages:
+        return [], 0
+    page = [{"job_id": entry["k"], "probability": entry["v"]} for entry in pages[0]["page"]]
+    return page, pages[0]["total"]
+
+async def migrate_user_state(db, batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """
+    Move embedding and prior off user documents into user_state. State written
+    since the split (e.g. a prior update during the migration) is newer than the
+    legacy copy and is kept; legacy fields are unset only after they are copied.
+    """
+    migrated = 0
+    legacy = {"$or": [{field: {"$exists": True}} for field in USER_STATE_FIELDS]}
+    while True:
+        users = await db.users.find(legacy, state_projection(USER_STATE_FIELDS)).limit(batch_size).to_list(length=batch_size)
+        if not users:
+            return migrated
+        emails = [user["email"] for user in users]
+        current = {
+            state["email"]: state
+            async for state in db.user_state.find({"email": {"$in": emails}}, {"_id": 0, "email": 1, **{f: 1 for f in USER_STATE_FIELDS}})
+        }
+        writes = []
+        for user in users:
+            newer = current.get(user["email"], {})
+            missing = {f: user[f] for f in USER_STATE_FIELDS if f in user and f not in newer}
+            if missing:
+                writes.append(UpdateOne({"email": user["email"]}, {"$set": missing}, upsert=True))
+        if writes:
+            await db.user_state.bulk_write(writes, ordered=False)
+        await db.users.update_many({"email": {"$in": emails}}, {"$unset": {f: "" for f in USER_STATE_FIELDS}})
+        migrated += len(users)
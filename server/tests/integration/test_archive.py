@@ -0,0 +1,48 @@
+import json
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from server.main import app
+from server.services.archive_service import archive_expired_jobs
+
+EXPIRED = {
+    "id": "test-job-expired8",
+    "title": "Expired Job8",
+    "company": "Test Company",
+    "location": "Remote",
+    "employmentType": "Full-Time",
+    "description": "A posting from long ago.",
+}
+
+
+def test_expired_job_is_archived(test_user_token, test_job_id):
+    """Jobs past the active window leave the live catalog but stay readable"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}"}
+        db = app.state.db
+        posted = (datetime.now(timezone.utc) - timedelta(days=400)).date().isoformat()
+        resp = client.post(
+            "/jobs/bulk",
+            content=json.dumps({**EXPIRED, "posted": posted}) + "\n",
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        )
+        assert resp.status_code == 200 and resp.json()["inserted"] == 1
+        # A legacy job without postedAt is aged by its `posted` date too
+        client.portal.call(db.jobs.insert_one, {**EXPIRED, "id": "test-job-legacy-expired8", "posted": posted})
+        try:
+            assert client.portal.call(archive_expired_jobs, db, 60) == 2
+            for job_id in (EXPIRED["id"], "test-job-legacy-expired8"):
+                assert client.portal.call(db.jobs.find_one, {"id": job_id}) is None
+                archived = client.portal.call(db.jobs_archive.find_one, {"id": job_id})
+                assert archived["title"] == EXPIRED["title"] and archived["postedAt"]
+
+            resp = client.get(f"/jobs/{EXPIRED['id']}", headers=headers)
+            assert resp.status_code == 200
+            assert resp.json()["description"] == EXPIRED["description"]
+            listed = client.get("/jobs/", params={"limit": 200}, headers=headers).json()
+            assert all(job["id"] != EXPIRED["id"] for job in listed)
+            # The live fixture job is inside the window and stays
+            assert client.portal.call(db.jobs.find_one, {"id": test_job_id}) is not None
+        finally:
+            for job_id in (EXPIRED["id"], "test-job-legacy-expired8"):
+                client.portal.call(db.jobs_archive.delete_one, {"id": job_id})
+                client.portal.call(db.job_details.delete_one, {"id": job_id})
@@ -0,0 +1,101 @@
+import time
+from fastapi.testclient import TestClient
+from server.config.auth_filter import PUBLIC_ROUTES
+from server.main import app
+from server.services import auth_service
+from server.services.auth_service import create_access_token
+
+JOB_PAYLOAD = {
+    "id": "test-job-auth",
+    "title": "Test Job Auth",
+    "company": "Test Company",
+    "location": "Remote",
+    "employmentType": "Full-Time",
+    "description": "This is a test job description.",
+}
+
+
+def test_list_jobs_without_token(test_job_id):
+    """Browsing the catalog is public"""
+    with TestClient(app) as client:
+        resp = client.get("/jobs/")
+        assert resp.status_code == 200
+
+
+def test_write_jobs_without_token():
+    """Creating, editing and deleting jobs needs a token"""
+    with TestClient(app) as client:
+        assert client.post("/jobs/", json=JOB_PAYLOAD).status_code == 403
+        assert client.put(f"/jobs/{JOB_PAYLOAD['id']}", json=JOB_PAYLOAD).status_code == 403
+        assert client.delete(f"/jobs/{JOB_PAYLOAD['id']}").status_code == 403
+
+
+def test_profile_without_token():
+    """The profile is private, with or without a malformed token"""
+    with TestClient(app) as client:
+        resp = client.get("/user/me")
+        assert resp.status_code == 403
+        assert resp.text == "Unauthorized access"
+
+        resp = client.get("/user/me", headers={"Authorization": "Bearer not-a-jwt"})
+        assert resp.status_code == 403
+        assert resp.text == "Invalid or expired token"
+
+
+def test_public_prefix_matches_whole_segments():
+    """"/auth" is public, "/authx" is not"""
+    assert PUBLIC_ROUTES.matches("POST", "/auth/login")
+    assert PUBLIC_ROUTES.matches("GET", "/auth")
+    assert not PUBLIC_ROUTES.matches("GET", "/authx")
+    assert not PUBLIC_ROUTES.matches("POST", "/jobs/")
+    with TestClient(app) as client:
+        assert client.get("/authx").status_code == 403
+
+
+def test_cors_preflight_without_token():
+    """OPTIONS preflight reaches CORS without a token"""
+    with TestClient(app) as client:
+        resp = client.options(
+            "/user/me",
+            headers={
+                "Origin": "http://localhost:5173",
+                "Access-Control-Request-Method": "PUT",
+                "Access-Control-Request-Headers": "Authorization",
+            },
+        )
+        assert resp.status_code == 200
+        assert resp.headers["access-control-allow-origin"] == "http://localhost:5173"
+
+
+def test_cached_token_expires(test_user_token):
+    """A verified token is cached, but not past its exp"""
+    with TestClient(app) as client:
+        exp = int(time.time()) + 2
+        token = create_access_token({"sub": token_subject(test_user_token), "exp": exp})
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/user/me", headers=headers).status_code == 200
+        assert token in auth_service.verified_tokens._data
+        time.sleep(max(0.0, exp - time.time()) + 1.1)
+        resp = client.get("/user/me", headers=headers)
+        assert resp.status_code == 403
+        assert resp.text == "Invalid or expired token"
+
+
+def test_token_decoded_once_per_request(test_user_token, monkeypatch):
+    """The route dependency reuses the claims the middleware verified"""
+    subject = token_subject(test_user_token)
+    decodes = []
+    decode = auth_service.decode_access_token
+    monkeypatch.setattr(auth_service, "decode_access_token", lambda token: decodes.append(token) or decode(token))
+    with TestClient(app) as client:
+        # A token the cache has not seen yet
+        token = create_access_token({"sub": subject, "exp": int(time.time()) + 600})
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.get("/user/me", headers=headers).status_code == 200
+        assert decodes == [token]
+        assert client.get("/user/me", headers=headers).status_code == 200
+        assert decodes == [token]
+
+
+def token_subject(token: str) -> str:
+    return auth_service.decode_access_token(token)["sub"]
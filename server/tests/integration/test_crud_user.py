@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 from server.main import app
+from server.services.user_state_service import get_user_state, migrate_user_state
 
 def test_update_user_profile(test_user_token, test_job_id):
     """Update profile for the shared test user"""
@@ -60,6 +61,54 @@ def test_reset_recommendations(test_user_token, test_job_id):
         data = resp.json()
         assert data["message"] == "Recommendations reset successfully"
 
+def test_history_add_page_remove(test_user_token, test_job_id):
+    """Add to history, read it a page at a time and remove it again"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}"}
+        resp = client.post("/user/history", json={"job_id": test_job_id}, headers=headers)
+        assert resp.status_code == 200
+        assert client.post("/user/history", json={"job_id": test_job_id}, headers=headers).status_code == 409
+
+        resp = client.get("/user/history", params={"limit": 1}, headers=headers)
+        assert resp.status_code == 200
+        assert int(resp.headers["x-total-count"]) >= 1
+        assert len(resp.json()) == 1 and "embedding" not in resp.json()[0]
+        assert test_job_id in client.get("/user/history/ids", headers=headers).json()
+
+        resp = client.delete(f"/user/history/{test_job_id}", headers=headers)
+        assert resp.status_code == 200
+        assert test_job_id not in client.get("/user/history/ids", headers=headers).json()
+
+def test_get_prior_page(test_user_token, test_job_id):
+    """The prior is served a page at a time, never with the profile"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}"}
+        assert "prior" not in client.get("/user/me", headers=headers).json()
+        resp = client.get("/user/prior", params={"limit": 1}, headers=headers)
+        assert resp.status_code == 200
+        assert int(resp.headers["x-total-count"]) >= 1
+        assert len(resp.json()) == 1 and set(resp.json()[0]) == {"job_id", "probability"}
+
+def test_legacy_user_state(test_user_token, test_job_id):
+    """State still on a legacy user document is read from there until it is migrated"""
+    with TestClient(app) as client:
+        db = app.state.db
+        legacy = {"email": "legacy-state@example.com", "name": "Legacy", "embedding": [0.5, 0.5], "prior": {test_job_id: 0.7}}
+        client.portal.call(db.users.insert_one, dict(legacy))
+        try:
+            state = client.portal.call(get_user_state, db, legacy["email"])
+            assert state == {"email": legacy["email"], "embedding": [0.5, 0.5], "prior": {test_job_id: 0.7}}
+            assert client.portal.call(get_user_state, db, legacy["email"], ("prior",)) == {"email": legacy["email"], "prior": {test_job_id: 0.7}}
+            assert client.portal.call(get_user_state, db, "nobody@example.com") is None
+
+            assert client.portal.call(migrate_user_state, db) >= 1
+            user = client.portal.call(db.users.find_one, {"email": legacy["email"]})
+            assert "embedding" not in user and "prior" not in user
+            assert client.portal.call(get_user_state, db, legacy["email"]) == state
+        finally:
+            client.portal.call(db.users.delete_one, {"email": legacy["email"]})
+            client.portal.call(db.user_state.delete_one, {"email": legacy["email"]})
+
 def test_delete_user_profile(test_user_token, test_job_id):
     with TestClient(app) as client:
         resp = client.delete("/user/me", headers={"Authorization": f"Bearer {test_user_token}"})
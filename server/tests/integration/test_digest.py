@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+from server.main import app
+from server.services.recommendation_service import iter_recommendations_for_users
+
+EMAILS = ["digest-prior@example.com", "digest-embedding@example.com", "digest-empty@example.com"]
+
+
+def test_digest_recommendations(test_job_id):
+    """Every requested user gets a result; users with no state get no recommendations"""
+    with TestClient(app) as client:
+        db = app.state.db
+        job = client.portal.call(db.jobs.find_one, {"id": test_job_id})
+        states = [
+            {"email": EMAILS[0], "prior": {test_job_id: 0.9}},
+            {"email": EMAILS[1], "embedding": job["embedding"]},
+            {"email": EMAILS[2]},
+        ]
+        client.portal.call(db.user_state.insert_many, states)
+
+        async def collect():
+            return [result async for result in iter_recommendations_for_users(db, EMAILS, k=3, block_size=2)]
+
+        try:
+            results = {result["email"]: result["recommendations"] for result in client.portal.call(collect)}
+            assert set(results) == set(EMAILS)
+            assert results[EMAILS[0]][0]["id"] == test_job_id
+            assert abs(results[EMAILS[0]][0]["score"] - 0.9) < 1e-6
+            # Closest job to its own embedding: cosine 1 -> score 1
+            assert results[EMAILS[1]][0]["id"] == test_job_id
+            assert abs(results[EMAILS[1]][0]["score"] - 1.0) < 1e-4
+            assert results[EMAILS[2]] == []
+            assert all(len(recs) <= 3 for recs in results.values())
+        finally:
+            client.portal.call(db.user_state.delete_many, {"email": {"$in": EMAILS}})
@@ -0,0 +1,32 @@
+from fastapi.testclient import TestClient
+from server.main import app
+from server.db import INDEXED_QUERIES
+
+def collscan_stages(plan):
+    """All COLLSCAN stages anywhere in an explain() plan tree"""
+    if isinstance(plan, dict):
+        found = [plan] if plan.get("stage") == "COLLSCAN" else []
+        for value in plan.values():
+            found += collscan_stages(value)
+        return found
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in collscan_stages(item)]
+    return []
+
+def test_service_queries_use_indexes(test_job_id):
+    """Every registered hot query must be answered by an index, never a collection scan"""
+    with TestClient(app) as client:
+        db = app.state.db
+
+        async def explain_all():
+            plans = {}
+            for collection, query, sort in INDEXED_QUERIES:
+                cursor = db[collection].find(query)
+                if sort:
+                    cursor = cursor.sort(sort)
+                plans[(collection, str(query))] = (await cursor.explain())["queryPlanner"]["winningPlan"]
+            return plans
+
+        plans = client.portal.call(explain_all)
+        scans = [key for key, plan in plans.items() if collscan_stages(plan)]
+        assert not scans, f"Collection scans for: {scans}"
@@ -1,6 +1,9 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from server.main import app
+from server.services.dedup_service import DEDUP_MODE
+from server.services.job_service import DESCRIPTION_PREVIEW_CHARS, migrate_job_details
 
 def test_search_jobs(test_user_token, test_job_id):
     """Test filtering jobs by company/title"""
@@ -15,6 +18,236 @@ def test_search_jobs(test_user_token, test_job_id):
         assert any(job["id"] == test_job_id for job in results)
 
 
+def test_suggest_jobs(test_user_token, test_job_id):
+    """Test typeahead over company names and titles"""
+    with TestClient(app) as client:
+        resp = client.get(
+            "/jobs/suggest",
+            params={"q": "test comp"},
+            headers={"Authorization": f"Bearer {test_user_token}"}
+        )
+        assert resp.status_code == 200
+        assert any(s["text"] == "Test Company" and s["field"] == "company" for s in resp.json())
+
+
+def test_list_jobs_paginated(test_user_token, test_job_id):
+    """Test keyset pagination and the slim listing projection"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}"}
+        resp = client.get("/jobs/", params={"limit": 1}, headers=headers)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert len(page) == 1
+        assert "embedding" not in page[0] and "raw" not in page[0]
+
+        cursor = resp.headers.get("x-next-cursor")
+        if cursor:
+            resp2 = client.get("/jobs/", params={"limit": 1, "cursor": cursor}, headers=headers)
+            assert resp2.status_code == 200
+            assert resp2.json()[0]["id"] > page[0]["id"]
+
+
+def test_list_jobs_ndjson(test_user_token, test_job_id):
+    """Test streaming the listing as NDJSON with a field selection"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}", "Accept": "application/x-ndjson"}
+        resp = client.get("/jobs/", params=[("fields", "title"), ("fields", "company")], headers=headers)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        jobs = [json.loads(line) for line in resp.text.splitlines() if line]
+        assert {"id": test_job_id, "title": "Test Job8", "company": "Test Company"} in jobs
+        assert all(set(job) <= {"id", "title", "company"} for job in jobs)
+
+
+def test_list_jobs_unknown_field(test_user_token, test_job_id):
+    """Test that an unknown field is a 400, streamed or not"""
+    with TestClient(app) as client:
+        for accept in ("application/json", "application/x-ndjson"):
+            resp = client.get(
+                "/jobs/",
+                params={"fields": "password"},
+                headers={"Authorization": f"Bearer {test_user_token}", "Accept": accept},
+            )
+            assert resp.status_code == 400
+            assert "password" in resp.json()["detail"]
+
+
+def test_filter_jobs_by_attributes(test_user_token, test_job_id):
+    """Test attribute filters served from the catalog index"""
+    with TestClient(app) as client:
+        resp = client.get(
+            "/jobs/filter",
+            params=[("location", "remote"), ("employmentType", "full time"), ("minSalary", 60000)],
+            headers={"Authorization": f"Bearer {test_user_token}"}
+        )
+        assert resp.status_code == 200
+        assert any(job["id"] == test_job_id for job in resp.json())
+
+        resp = client.get(
+            "/jobs/filter",
+            params=[("location", "remote"), ("minSalary", 200000)],
+            headers={"Authorization": f"Bearer {test_user_token}"}
+        )
+        assert resp.status_code == 200
+        assert all(job["id"] != test_job_id for job in resp.json())
+
+
+def test_job_facets(test_user_token, test_job_id):
+    """Test facet counts for the current search and filters"""
+    with TestClient(app) as client:
+        resp = client.get(
+            "/jobs/facets",
+            params=[("search", "Test Company"), ("employmentType", "full time")],
+            headers={"Authorization": f"Bearer {test_user_token}"}
+        )
+        assert resp.status_code == 200
+        facets = resp.json()
+        assert facets["total"] >= 1
+        assert any(f["value"] == "Remote" and f["count"] >= 1 for f in facets["location"])
+        # employmentType counts ignore the employmentType filter itself
+        assert any(f["value"] == "Full-Time" for f in facets["employmentType"])
+        assert any(b["min"] <= 100000 and b["count"] >= 1 for b in facets["salary"])
+
+
+def test_bulk_create_jobs(test_user_token, test_job_id):
+    """Test NDJSON import: valid rows are upserted, bad lines are reported by number"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}", "Content-Type": "application/x-ndjson"}
+        rows = [
+            {"id": f"test-job-bulk8-{i}", "title": title, "company": "Bulk Company", "location": "Remote",
+             "employmentType": "Contract", "description": description, "posted": "3 days ago"}
+            for i, (title, description) in enumerate([
+                ("Bulk Backend Engineer", "Go services and Postgres."),
+                ("Bulk Data Scientist", "Forecasting models in Python."),
+            ])
+        ]
+        lines = [
+            json.dumps(rows[0]),
+            "{not json",
+            json.dumps({"id": "test-job-bulk8-incomplete", "title": "No location"}),
+            "",
+            json.dumps(rows[1]),
+            json.dumps([1, 2, 3]),
+        ]
+        resp = client.post("/jobs/bulk", content="\n".join(lines) + "\n", headers=headers)
+        assert resp.status_code == 200
+        result = resp.json()
+        assert result["received"] == 5 and result["inserted"] == 2 and result["updated"] == 0 and result["failed"] == 3
+        assert [error["line"] for error in result["errors"]] == [2, 3, 6]
+        assert "location" in result["errors"][1]["error"]
+
+        # Re-sending an existing id updates it in place
+        edited = {**rows[0], "title": "Bulk Backend Engineer II"}
+        resp = client.post("/jobs/bulk", content=json.dumps(edited), headers=headers)
+        assert resp.json()["inserted"] == 0 and resp.json()["updated"] == 1
+        job = client.get(f"/jobs/{rows[0]['id']}", headers={"Authorization": f"Bearer {test_user_token}"}).json()
+        assert job["title"] == "Bulk Backend Engineer II" and job["embedding"]
+        for row in rows:
+            client.delete(f"/jobs/{row['id']}", headers={"Authorization": f"Bearer {test_user_token}"})
+
+
+def test_migrated_job_details(test_user_token, test_job_id):
+    """Test that a legacy job keeps its full description in the detail view after migration"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}"}
+        db = app.state.db
+        description = "Legacy posting. " * (DESCRIPTION_PREVIEW_CHARS // 8)
+        legacy = {"id": "test-job-legacy8", "title": "Legacy Job8", "company": "Test Company", "location": "Remote",
+                  "employmentType": "Full-Time", "description": description, "raw": {"source": "csv"}}
+        client.portal.call(db.jobs.insert_one, legacy)
+        try:
+            assert client.portal.call(migrate_job_details, db) >= 1
+            stored = client.portal.call(db.jobs.find_one, {"id": legacy["id"]})
+            assert stored["detailsOffloaded"] and "raw" not in stored
+
+            resp = client.get(f"/jobs/{legacy['id']}", headers=headers)
+            assert resp.status_code == 200
+            assert resp.json()["description"] == description
+
+            resp = client.get("/jobs/", params=[("fields", "description"), ("limit", 200)], headers=headers)
+            listed = next(job for job in resp.json() if job["id"] == legacy["id"])
+            assert listed["description"] == description[:DESCRIPTION_PREVIEW_CHARS]
+        finally:
+            client.portal.call(db.jobs.delete_one, {"id": legacy["id"]})
+            client.portal.call(db.job_details.delete_one, {"id": legacy["id"]})
+
+
+def test_search_keyword_and_hybrid(test_user_token, test_job_id):
+    """Test BM25 and hybrid search; only personalizing needs a token"""
+    with TestClient(app) as client:
+        resp = client.get("/jobs/search", params={"q": "test job description"})
+        assert resp.status_code == 200
+        assert any(hit["id"] == test_job_id for hit in resp.json())
+        assert int(resp.headers["x-total-count"]) >= 1
+
+        resp = client.get("/jobs/search", params={"q": "test job description", "mode": "hybrid"})
+        assert resp.status_code == 200
+        assert any(hit["id"] == test_job_id for hit in resp.json())
+        assert "embed;dur=" in resp.headers["server-timing"]
+
+        params = {"q": "test job description", "mode": "hybrid", "personalize": True}
+        assert client.get("/jobs/search", params=params).status_code == 403
+        resp = client.get("/jobs/search", params=params, headers={"Authorization": f"Bearer {test_user_token}"})
+        assert resp.status_code == 200
+        assert any(hit["id"] == test_job_id for hit in resp.json())
+
+
+def test_job_etag_round_trip(test_user_token, test_job_id):
+    """Test 304 for a current ETag, a fresh body after a write, and If-None-Match: *"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}"}
+        resp = client.get(f"/jobs/{test_job_id}", headers=headers)
+        assert resp.status_code == 200
+        etag, original = resp.headers["etag"], resp.json()
+
+        resp = client.get(f"/jobs/{test_job_id}", headers={**headers, "If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.headers["etag"] == etag
+        resp = client.get("/jobs/filter", params=[("search", "Test Company")], headers=headers)
+        filter_etag = resp.headers["etag"]
+        resp = client.get("/jobs/filter", params=[("search", "test company")], headers={**headers, "If-None-Match": filter_etag})
+        assert resp.status_code == 304
+
+        assert client.get(f"/jobs/{test_job_id}", headers={**headers, "If-None-Match": "*"}).status_code == 304
+        assert client.get("/jobs/no-such-job8", headers={**headers, "If-None-Match": "*"}).status_code == 404
+
+        # A write invalidates every cached body and validator
+        edited = {**original, "title": "Test Job8 Edited"}
+        assert client.put(f"/jobs/{test_job_id}", json=edited, headers=headers).status_code == 200
+        try:
+            resp = client.get(f"/jobs/{test_job_id}", headers={**headers, "If-None-Match": etag})
+            assert resp.status_code == 200
+            assert resp.headers["etag"] != etag
+            assert resp.json()["title"] == "Test Job8 Edited"
+            resp = client.get("/jobs/filter", params=[("search", "Test Company")], headers={**headers, "If-None-Match": filter_etag})
+            assert resp.status_code == 200
+            assert any(job["title"] == "Test Job8 Edited" for job in resp.json())
+        finally:
+            client.put(f"/jobs/{test_job_id}", json=original, headers=headers)
+
+
+def test_repost_is_deduplicated(test_user_token, test_job_id):
+    """Test that a near-identical repost is flagged (or merged) as a duplicate"""
+    with TestClient(app) as client:
+        headers = {"Authorization": f"Bearer {test_user_token}"}
+        original = client.get(f"/jobs/{test_job_id}", headers=headers).json()
+        repost = {k: original[k] for k in ("title", "company", "location", "employmentType", "description", "salaryMin", "salaryMax", "currency")}
+        repost["id"] = "test-job-id8-repost"
+        resp = client.post("/jobs", json=repost, headers=headers)
+        assert resp.status_code == 200
+
+        if DEDUP_MODE == "merge":
+            # The original is kept and answers for the repost id too
+            assert resp.json()["id"] == test_job_id
+            stored = client.portal.call(app.state.db.jobs.find_one, {"id": test_job_id})
+            assert repost["id"] in stored.get("aliases", [])
+            assert client.get(f"/jobs/{repost['id']}", headers=headers).json()["id"] == test_job_id
+        else:
+            stored = client.portal.call(app.state.db.jobs.find_one, {"id": repost["id"]})
+            assert stored["duplicateOf"] == test_job_id
+            client.delete(f"/jobs/{repost['id']}", headers=headers)
+
+
 def test_delete_job(test_user_token, test_job_id):
     """Test deleting the job"""
     with TestClient(app) as client:
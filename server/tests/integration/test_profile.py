@@ -0,0 +1,72 @@
+import time
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from server.main import app
+from server.services.profile_service import PROFILE_PENDING, PROFILE_PROCESSING, PROFILE_READY, build_user_state_now, process_next_pending
+
+PROFILE = {
+    "name": "Profile Worker User",
+    "email": "test-profile@example.com",
+    "phone": "1234567890",
+    "location": "Test City",
+    "summary": "Backend developer.",
+    "skills": "Python,FastAPI",
+    "password": "securepassword",
+    "role": "Developer",
+}
+
+
+def wait_for_state(client, email, timeout=30.0):
+    """The user's state once built, inline here or by the background worker"""
+    db = app.state.db
+    if client.portal.call(build_user_state_now, db, email) is None:
+        deadline = time.monotonic() + timeout
+        while client.portal.call(db.users.find_one, {"email": email, "profile_state": {"$exists": True}}):
+            assert time.monotonic() < deadline, "profile state was never built"
+            time.sleep(0.1)
+    return client.portal.call(db.user_state.find_one, {"email": email})
+
+
+def test_signup_defers_profile_state(test_job_id):
+    """Signup answers before the embedding exists; recommendations say whether they are personal"""
+    with TestClient(app) as client:
+        resp = client.post("/auth/signup", json=PROFILE)
+        assert resp.status_code == 200
+        assert resp.json()["profile_state"] == PROFILE_PENDING
+        headers = {"Authorization": f"Bearer {resp.json()['token']}"}
+        try:
+            resp = client.get("/user/recommendations", headers=headers)
+            assert resp.status_code == 200
+            assert resp.headers["x-profile-state"] in (PROFILE_PENDING, PROFILE_PROCESSING, PROFILE_READY)
+
+            state = wait_for_state(client, PROFILE["email"])
+            assert state["embedding"] and isinstance(state.get("prior"), dict)
+            resp = client.get("/user/recommendations", headers=headers)
+            assert resp.headers["x-profile-state"] == PROFILE_READY
+        finally:
+            client.delete("/user/me", headers=headers)
+
+
+def test_stale_claim_is_retried(test_job_id):
+    """A claim left behind by a crashed worker is picked up again"""
+    with TestClient(app) as client:
+        db = app.state.db
+        resp = client.post("/auth/signup", json=PROFILE)
+        headers = {"Authorization": f"Bearer {resp.json()['token']}"}
+        try:
+            wait_for_state(client, PROFILE["email"])
+            client.portal.call(db.user_state.delete_one, {"email": PROFILE["email"]})
+            crashed = datetime.now(timezone.utc) - timedelta(days=1)
+            client.portal.call(
+                db.users.update_one,
+                {"email": PROFILE["email"]},
+                {"$set": {"profile_state": PROFILE_PROCESSING, "profileClaimedAt": crashed}},
+            )
+            # Either this call or the background worker rebuilds it
+            client.portal.call(process_next_pending, db)
+            state = wait_for_state(client, PROFILE["email"])
+            assert state and state["embedding"]
+            user = client.portal.call(db.users.find_one, {"email": PROFILE["email"]})
+            assert "profile_state" not in user and "profileClaimedAt" not in user
+        finally:
+            client.delete("/user/me", headers=headers)
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from server.services.archive_service import parse_posted, posted_at
+
+NOW = datetime(2024, 6, 15, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("today", NOW),
+    ("Just posted", NOW),
+    ("yesterday", NOW - timedelta(days=1)),
+    ("3 days ago", NOW - timedelta(days=3)),
+    ("Posted 2 weeks ago", NOW - timedelta(days=14)),
+    ("30+ days ago", NOW - timedelta(days=30)),
+    ("1 month ago", NOW - timedelta(days=30)),
+    ("5 hours ago", NOW - timedelta(hours=5)),
+])
+def test_parse_relative_dates(value, expected):
+    assert parse_posted(value, now=NOW) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "2024-03-01", "2024-03-01T00:00:00", "2024-03-01T00:00:00+00:00", "01/03/2024", "01-03-2024",
+    "Mar 01, 2024", "01 Mar 2024", "March 01, 2024", "01 March 2024",
+])
+def test_parse_absolute_dates(value):
+    assert parse_posted(value, now=NOW) == datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def test_parse_keeps_datetimes_and_rejects_garbage():
+    naive = datetime(2024, 3, 1)
+    assert parse_posted(naive) == naive.replace(tzinfo=timezone.utc)
+    assert parse_posted(NOW) is NOW
+    assert parse_posted("2024-03-01T00:00:00+02:00").utcoffset() == timedelta(hours=2)
+    for value in (None, "", "   ", "soon", "2024-13-45"):
+        assert parse_posted(value, now=NOW) is None
+
+
+def test_posted_at_falls_back_to_stored_then_now():
+    stored = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert posted_at({"posted": "2024-03-01", "postedAt": stored}) == datetime(2024, 3, 1, tzinfo=timezone.utc)
+    assert posted_at({"posted": "whenever", "postedAt": stored}) == stored
+    assert datetime.now(timezone.utc) - posted_at({}) < timedelta(seconds=5)
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from server.services import auth_service
+from server.services.auth_service import PasswordHasher, password_needs_rehash, verify_password
+
+
+def test_hasher_sheds_load_beyond_workers_and_queue():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = [asyncio.create_task(hasher.run(gate.wait, 5)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as shed:
+            await hasher.run(gate.wait, 5)
+        assert shed.value.status_code == 503 and shed.value.headers["Retry-After"] == "1"
+        stats = hasher.stats()
+        assert stats["in_flight"] == 2 and stats["queued"] == 1 and stats["rejected"] == 1
+        gate.set()
+        return await asyncio.gather(*running)
+
+    assert asyncio.run(scenario()) == [True, True]
+    stats = hasher.stats()
+    assert stats["in_flight"] == 0 and stats["completed"] == 2 and stats["rejected"] == 1
+    assert stats["max_wait_ms"] >= stats["avg_wait_ms"] >= 0
+
+
+def test_cancelled_login_counts_until_the_hash_finishes():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    gate, done = threading.Event(), threading.Event()
+
+    def slow_hash():
+        gate.wait(5)
+        done.set()
+        return True
+
+    async def scenario():
+        login = asyncio.create_task(hasher.run(slow_hash))
+        await asyncio.sleep(0.01)
+        login.cancel()
+        await asyncio.sleep(0.01)
+        # The thread is still busy, so the cap still holds
+        assert hasher.in_flight == 1
+        with pytest.raises(HTTPException):
+            await hasher.run(slow_hash)
+        gate.set()
+        await asyncio.get_running_loop().run_in_executor(None, done.wait, 5)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert hasher.in_flight == 0
+
+
+def test_verify_password_on_the_pool():
+    hasher = PasswordHasher(workers=2, max_queue=2)
+    stored = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode()
+
+    async def scenario():
+        return await asyncio.gather(
+            hasher.run(verify_password, "secret", stored), hasher.run(verify_password, "wrong", stored)
+        )
+
+    assert asyncio.run(scenario()) == [True, False]
+    assert hasher.stats()["completed"] == 2
+
+
+def test_password_needs_rehash(monkeypatch):
+    monkeypatch.setattr(auth_service, "BCRYPT_ROUNDS", 5)
+    assert password_needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=4)).decode())
+    assert not password_needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=5)).decode())
+    assert not password_needs_rehash("plain-text-legacy")
+    assert not password_needs_rehash(None)
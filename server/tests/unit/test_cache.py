@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from server.services.cache_service import SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight("test_coalesce")
+    runs = 0
+
+    async def work():
+        nonlocal runs
+        runs += 1
+        run = runs
+        await asyncio.sleep(0.01)
+        return run
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)), flight.do("other", work))
+
+    results = asyncio.run(scenario())
+    assert runs == 2
+    assert results[:5] == [results[0]] * 5 and results[5] != results[0]
+    assert flight.stats() == {"calls": 6, "deduplicated": 4, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight("test_errors")
+    runs = 0
+
+    async def failing():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert runs == 1
+    assert all(isinstance(r, ValueError) and str(r) == "boom" for r in results)
+    # The failed run is forgotten: the next call tries again
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do("key", failing))
+    assert runs == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_work():
+    flight = SingleFlight("test_cancel")
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def work():
+            await gate.wait()
+            return "done"
+
+        first = asyncio.create_task(flight.do("key", work))
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "done"
+    assert flight.stats()["in_flight"] == 0
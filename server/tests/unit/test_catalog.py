@@ -0,0 +1,40 @@
+import numpy as np
+from server.services.catalog_service import AttributeIndex, Catalog, QuantizedMatrix, fit_projection
+
+
+def random_catalog(n=3000, dim=64, rank=16, seed=0):
+    """Unit rows near a low-rank subspace, like sentence embeddings, and queries near some of them"""
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dim))
+    matrix = rng.standard_normal((n, rank)) @ basis + 0.05 * rng.standard_normal((n, dim))
+    matrix = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+    queries = matrix[rng.integers(n, size=20)] + 0.05 * rng.standard_normal((20, dim))
+    return matrix, queries.astype(np.float32)
+
+
+def exact_top_k(matrix, q, k):
+    scores = matrix @ (q / np.linalg.norm(q))
+    return np.argsort(-scores, kind="stable")[:k]
+
+
+def test_quantized_matmul_is_close():
+    matrix, queries = random_catalog()
+    quantized = QuantizedMatrix.from_float(matrix, spill=False)
+    assert quantized.codes.dtype == np.int8
+    for q in queries:
+        assert np.allclose(quantized @ q, matrix @ q, atol=0.02 * np.linalg.norm(q))
+    assert np.allclose(quantized @ queries.T, matrix @ queries.T, atol=0.02 * np.linalg.norm(queries, axis=1).max())
+
+
+def test_top_k_matches_exact_scoring(tmp_path):
+    matrix, queries = random_catalog()
+    ids = [str(i) for i in range(len(matrix))]
+    catalogs = {
+        "projection": Catalog(ids, matrix, AttributeIndex(), version=0, projection=fit_projection(matrix, 32, version=0)),
+        "int8": Catalog(ids, QuantizedMatrix.from_float(matrix, spill=True, spill_dir=str(tmp_path)), AttributeIndex(), version=0),
+    }
+    for name, catalog in catalogs.items():
+        for q in queries:
+            rows, scores = catalog.top_k(q, 10)
+            assert rows.tolist() == exact_top_k(matrix, q, 10).tolist(), name
+            assert np.allclose(scores, matrix[rows] @ (q / np.linalg.norm(q)), atol=1e-5), name
@@ -0,0 +1,85 @@
+import asyncio
+import numpy as np
+from server.services import search_service
+from server.services.search_service import BM25Index
+
+JOBS = [
+    {"id": "a", "title": "Python Developer", "company": "Acme", "description": "Build APIs in python and fastapi."},
+    {"id": "b", "title": "Data Engineer", "company": "Initech", "description": "Spark pipelines, some python scripting."},
+    {"id": "c", "title": "Frontend Engineer", "company": "Globex", "description": "React and typescript."},
+]
+
+
+def build(jobs=JOBS):
+    index = BM25Index()
+    for job in jobs:
+        index.add(dict(job))
+    return index
+
+
+def test_bm25_ranks_title_matches_first():
+    index = build()
+    hits, total = index.search("python")
+    assert total == 2
+    assert [job_id for job_id, _ in hits] == ["a", "b"]
+    assert hits[0][1] > hits[1][1] > 0
+    assert index.search("kubernetes") == ([], 0)
+
+
+def test_bm25_pages_and_selects_precomputed_scores():
+    index = build()
+    scores = index.score_all("engineer")
+    first, total = index.rank(scores, limit=1)
+    second, _ = index.rank(scores, limit=1, offset=1)
+    assert total == 2 and {first[0][0], second[0][0]} == {"b", "c"}
+    selected = index.select(scores, ["b", "a", "missing"])
+    assert selected[0] > 0 and selected[1] == 0 and selected[2] == 0
+    assert np.allclose(selected, index.scores_for("engineer", ["b", "a", "missing"]))
+
+
+def test_bm25_tombstones_removed_and_replaced_jobs():
+    index = build()
+    index.remove("a")
+    assert [job_id for job_id, _ in index.search("python")[0]] == ["b"]
+    index.add({"id": "b", "title": "Rust Engineer", "company": "Initech", "description": "Systems work."})
+    assert index.search("python") == ([], 0)
+    assert [job_id for job_id, _ in index.search("rust")[0]] == ["b"]
+    assert len(index) == 2 and index.dead == 2
+
+
+def test_bm25_compaction_keeps_scores():
+    index = build()
+    index.remove("a")
+    index.add({"id": "b", "title": "Rust Engineer", "company": "Initech", "description": "Systems work."})
+    before = {q: index.search(q) for q in ("rust", "engineer", "react")}
+    size = index.nbytes()
+    index.compact()
+    assert index.dead == 0 and len(index.doc_ids) == len(index) == 2
+    assert index.nbytes() < size
+    assert {q: index.search(q) for q in before} == before
+
+
+def test_writes_during_rebuild_are_replayed(monkeypatch):
+    """A job indexed or removed while the index is rebuilt survives the swap"""
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_build(db):
+        started.set()
+        await release.wait()
+        return build()  # the snapshot the scan saw: still has "c", lacks "d"
+
+    monkeypatch.setattr(search_service, "build_text_index", slow_build)
+    monkeypatch.setattr(search_service, "_text_index", None)
+
+    async def scenario():
+        rebuild = asyncio.create_task(search_service.get_text_index(None))
+        await started.wait()
+        search_service.index_job({"id": "d", "title": "Python Intern", "company": "Acme", "description": ""})
+        search_service.unindex_job("c")
+        release.set()
+        return await rebuild
+
+    index = asyncio.run(scenario())
+    assert index is search_service._text_index
+    assert "d" in index.doc_num and "c" not in index.doc_num
+    assert search_service._pending["text"] is None